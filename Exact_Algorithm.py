@@ -0,0 +1,269 @@
+import heapq
+import bisect
+import time
+import instrumentation
+import bounds
+from schedule import Schedule
+from sparse_graph import graph_tasks
+from Partition_Algorithm import Partition_Algorithm
+
+# the maximal number of the states expanded by one search, the best known schedule is returned after it
+MAX_STATES = 200_000
+
+# the default wall-clock limit of one search in seconds, the expansions of the large instances take milliseconds each
+# (up to 3^k joint moves), so the search is stopped by the time long before MAX_STATES on them
+TIME_LIMIT = 10
+
+# the maximal number of robots searched, an expansion of k robots generates up to 3^k children (e.g. 0.5 s for k = 10),
+# so for more robots the search is not started and the incumbent is returned as not proven optimal
+MAX_ROBOTS = 8
+
+
+# the joint search state is (positions, counters, done):
+# <positions> is the tuple of the robots vertices in the order of the robots on the path, the robots never pass each other
+# without a vertex or a swap conflict, so the order of the robots at the start is kept by every collision-free schedule,
+# <counters> is the tuple of the numbers of the consecutive timesteps each robot has been at its vertex (the arrival counts),
+# kept only for the robots at the vertices of the uncompleted tasks and 0 for the others,
+# <done> is the bit mask of the completed tasks, a task (p, d) is completed when the counter of a robot at p reaches d + 1
+# The time is not a part of the state: the moves do not depend on the time, so a state reached earlier is never worse
+
+
+# the lower bound of the number of timesteps left to complete all the tasks from the state, it is consistent, i.e.
+# it decreases by at most 1 per timestep:
+# - every task needs the nearest robot to get there and to stay for its duration (the robot at the task to finish the stay)
+# - the k robots share the remaining timesteps of the stays at the tasks
+# <nearest> is the list of (robot at the task or -1, distance from the nearest robot) of the tasks for the positions
+def remaining_bound(nearest, counters, done, tasks):
+
+    longest = 0
+    work = 0
+
+    for j, ((_, d), (i, distance)) in enumerate(zip(tasks, nearest)):
+
+        if done >> j & 1:
+            continue
+
+        if i >= 0:
+            need = d + 1 - counters[i]
+            work += need
+        else:
+            need = d + distance
+            work += d + 1
+
+        if need > longest:
+            longest = need
+
+    return max(longest, -(-work // len(counters)))
+
+
+# the list of (robot at the task or -1, distance from the nearest robot) of the tasks for the robots <positions>
+def nearest_robots(positions, tasks):
+
+    nearest = []
+    for p, _ in tasks:
+
+        i = bisect.bisect_left(positions, p)
+        if i < len(positions) and positions[i] == p:
+            nearest.append((i, 0))
+        else:
+            nearest.append((-1, min(abs(positions[i-1] - p) if i > 0 else float('inf'),
+                                    abs(positions[i] - p) if i < len(positions) else float('inf'))))
+
+    return nearest
+
+
+# generates the positions of the robots after one timestep, each robot moves to a neighbouring vertex or stays,
+# the robots keep their order, so there are no vertex and no swap conflicts
+# <move> is the positions of the first robots already chosen, the up to 3^k moves are generated one at a time
+def joint_moves(positions, n, move=()):
+
+    if len(move) == len(positions):
+        yield move
+        return
+
+    p = positions[len(move)]
+    for q in (p - 1, p, p + 1):
+        if 0 <= q < n and (not move or q > move[-1]):
+            yield from joint_moves(positions, n, move + (q,))
+
+
+# the state after the robots move to <new_positions> from the state (positions, counters, done)
+def next_state(positions, counters, done, new_positions, task_index, tasks):
+
+    new_counters = []
+    for p, c, q in zip(positions, counters, new_positions):
+
+        j = task_index.get(q)
+        if j is None or done >> j & 1:
+            new_counters.append(0)
+            continue
+
+        c = c + 1 if p == q else 1
+        if c == tasks[j][1] + 1:
+            done |= 1 << j
+            c = 0
+        new_counters.append(c)
+
+    return new_positions, tuple(new_counters), done
+
+
+# checks if the state (positions, counters, done) reached at <t> dominates the one with the same positions reached at
+# <other_t>: it is reached not later, has all the tasks of the other one completed and all its counters at the tasks
+# the other state has not completed yet are not smaller
+def dominates(positions, task_index, t, done, counters, other_t, other_done, other_counters):
+
+    return t <= other_t and done & other_done == other_done and \
+           all(b == 0 or a >= b or done >> task_index[p] & 1 for p, a, b in zip(positions, counters, other_counters))
+
+
+# adds the state reached at <t> to the states generated with the same positions unless one of them dominates it,
+# the states it dominates are removed, so <seen> keeps only the non-dominated (time, counters) by the positions and done,
+# only the entries of the supersets (subsets) of done are compared, the others cannot dominate it (be dominated by it)
+# returns False if the state is dominated
+def add_nondominated(seen, positions, counters, done, t, task_index):
+
+    front = seen.setdefault(positions, {})
+    for other_done, entries in front.items():
+        if other_done & done == done:
+            for other_t, other_counters in entries:
+                if dominates(positions, task_index, other_t, other_done, other_counters, t, done, counters):
+                    return False
+
+    for other_done in [other_done for other_done in front if other_done & done == other_done]:
+        entries = [(other_t, other_counters) for other_t, other_counters in front[other_done]
+                   if not dominates(positions, task_index, t, done, counters, other_t, other_done, other_counters)]
+        if entries:
+            front[other_done] = entries
+        else:
+            del front[other_done]
+
+    front.setdefault(done, []).append((t, counters))
+
+    return True
+
+
+# calculates the optimal collision-free schedule on the path graph with the A* search over the joint states of the robots
+# <graph> is an array of integer numbers, i.e. [0 1 3 0 0 0 0],
+# containing either the task duration
+# or 0 for vertices with no tasks, or the SparseGraph of the same tasks
+# <robots> is the list of robots starting positions
+# <initial_schedule> is a known schedule (e.g. of PA), the shortest of it and the PA schedule is the initial incumbent,
+# the search looks only for the schedules shorter than the incumbent and the states that cannot lead to them are pruned
+# the search stops after <time_limit> seconds (no limit if None) or <max_states> expanded states and returns the incumbent,
+# it is not started for more than MAX_ROBOTS robots
+# returns (length, schedule, optimal), <optimal> is False if the search is stopped before it proves the schedule optimal
+def Exact_Algorithm(graph, robots, initial_schedule=None, time_limit=TIME_LIMIT, max_states=MAX_STATES):
+
+    start_time = time.time()
+
+    task_locations, durations = graph_tasks(graph)
+    tasks = list(zip(task_locations.tolist(), durations.astype(int).tolist()))
+    task_index = {p: j for j, (p, _) in enumerate(tasks)}
+    n = len(graph)
+
+    # the robots in the order on the path, rank[r] is the index of the robot r in it
+    order = sorted(range(len(robots)), key=lambda r: robots[r])
+    rank = sorted(range(len(robots)), key=lambda r: order[r])
+
+    length, schedule = Partition_Algorithm(graph, [robots[r] for r in order])
+    schedule = Schedule(schedule.positions[rank], schedule.lengths[rank])
+    if initial_schedule is not None and initial_schedule.makespan() < length:
+        length, schedule = initial_schedule.makespan(), initial_schedule
+
+    if length <= bounds.lower_bound(graph, robots):
+        return length, schedule, True
+
+    if len(robots) > MAX_ROBOTS:
+        return length, schedule, False
+
+    all_done = (1 << len(tasks)) - 1
+
+    start = (tuple(robots[r] for r in order), tuple(0 if robots[r] not in task_index else 1 for r in order), 0)
+
+    # the nearest robots of the tasks by the positions of the robots, computed once for each positions of a generated state,
+    # the up to 3^k joint moves are built only for the expanded states
+    nearest = {}
+
+    def positions_nearest(positions):
+        if positions not in nearest:
+            nearest[positions] = nearest_robots(positions, tasks)
+        return nearest[positions]
+
+    deadline = None if time_limit is None else start_time + time_limit
+
+    # the heap of (f, -t, tie, state), the deeper states first among the states of the same f
+    heap = [(remaining_bound(positions_nearest(start[0]), start[1], start[2], tasks), 0, 0, start)]
+    parents = {start: None}
+    seen = {start[0]: {start[2]: [(0, start[1])]}}
+    expanded = 0
+    generated = 0
+    dominated = 0
+    goal = None
+    stopped = False
+
+    while heap:
+
+        f, t, _, state = heapq.heappop(heap)
+        t = -t
+        # the state is dominated by a state generated after it was pushed
+        if (t, state[1]) not in seen[state[0]].get(state[2], ()):
+            continue
+
+        if state[2] == all_done:
+            goal = state
+            break
+
+        expanded += 1
+        if expanded > max_states:
+            stopped = True
+            break
+
+        positions, counters, done = state
+        for new_positions in joint_moves(positions, n):
+
+            # the clock is checked for every child, so one expansion of many robots does not overrun the limit
+            if deadline is not None and time.time() > deadline:
+                stopped = True
+                break
+
+            child = next_state(positions, counters, done, new_positions, task_index, tasks)
+            generated += 1
+
+            # only the schedules shorter than the incumbent are searched for
+            child_f = t + 1 + remaining_bound(positions_nearest(child[0]), child[1], child[2], tasks)
+            if child_f >= length:
+                continue
+
+            if not add_nondominated(seen, child[0], child[1], child[2], t + 1, task_index):
+                dominated += 1
+                continue
+
+            parents[child] = state
+            heapq.heappush(heap, (child_f, -(t + 1), generated, child))
+
+        if stopped:
+            break
+
+    if instrumentation.enabled:
+        instrumentation.count("expanded_states", expanded)
+        instrumentation.count("generated_states", generated)
+        instrumentation.count("dominated_states", dominated)
+
+    # the search is exhausted without a shorter schedule, so the incumbent is optimal
+    if goal is None:
+        return length, schedule, not stopped
+
+    # the positions of the robots at every timestep from the start to the goal, the parents of the states reached again
+    # earlier are replaced, so the path may be shorter than the time of the goal
+    path = []
+    state = goal
+    while state is not None:
+        path.append(state[0])
+        state = parents[state]
+    path.reverse()
+
+    rows = [None] * len(robots)
+    for idx, r in enumerate(order):
+        rows[r] = [positions[idx] for positions in path]
+
+    return len(path) - 1, Schedule(rows), True
@@ -1,68 +1,149 @@
 import numpy as np
+import heapq
+import instrumentation
+from schedule import Schedule
+from sparse_graph import graph_tasks
 
 
-def try_update_schedule(graph, robot_schedules, robot, task):
+# the space-time reservation index of the robots schedules used for the collision checks
+# <occupied> is the set of (timestep, vertex) pairs taken by the schedules
+# <last_visit> is the last timestep each vertex is visited at by any schedule
+# <parked> maps a vertex to the robots that end their schedules there with the lengths of their schedules,
+# such robots stay at that vertex forever after the end of their schedules
+class OccupancyIndex:
+
+    __slots__ = ("occupied", "last_visit", "parked", "end_vertex")
+
+    def __init__(self, robot_schedules):
+
+        self.occupied = set()
+        self.last_visit = {}
+        self.parked = {}
+        self.end_vertex = {}
+
+        for robot, schedule in robot_schedules.items():
+            self.reserve(robot, 0, schedule)
+
+    # checks if <subschedule> of <robot> starting at <start_timestep> collides with the other robots, 
+    # takes time proportional to the length of the subschedule
+    def is_free(self, robot, start_timestep, subschedule):
+
+        end_timestep = start_timestep + len(subschedule)
+
+        # check if the final vertex is visited by another robot after the robot arrives there to stay
+        if self.last_visit.get(subschedule[-1], -1) >= end_timestep:
+            return False
+
+        for i, vertex in enumerate(subschedule):
+
+            # check if any other robot is at the same location at the same timestep
+            if (start_timestep + i, vertex) in self.occupied:
+                return False
+
+            # check if another robot is already parked at the location, the final step is not checked
+            if i < len(subschedule) - 1:
+                for other_robot, length in self.parked.get(vertex, {}).items():
+                    if other_robot != robot and length <= start_timestep + i:
+                        return False
+
+        return True
+
+    # reserves <subschedule> of <robot> starting at <start_timestep>
+    def reserve(self, robot, start_timestep, subschedule):
+
+        if not subschedule:
+            return
+
+        for i, vertex in enumerate(subschedule):
+            self.occupied.add((start_timestep + i, vertex))
+            self.last_visit[vertex] = max(self.last_visit.get(vertex, -1), start_timestep + i)
+
+        if robot in self.end_vertex:
+            del self.parked[self.end_vertex[robot]][robot]
+
+        self.end_vertex[robot] = subschedule[-1]
+        self.parked.setdefault(subschedule[-1], {})[robot] = start_timestep + len(subschedule)
+
+
+# <occupancy> is the OccupancyIndex of <robot_schedules>, built from scratch if None
+def try_update_schedule(graph, robot_schedules, robot, task, occupancy=None):
+
+    if occupancy is None:
+        occupancy = OccupancyIndex(robot_schedules)
 
     start_timestep = len(robot_schedules[robot])  # current timestep of the robot
     robot_loc = robot_schedules[robot][-1] # robot location at the end of the last step
     
-    subschedule = [robot_loc]
-    while len(subschedule) <= abs(task - robot_loc):  # move to the task
-        subschedule.append(int(subschedule[-1] + np.sign(task - robot_loc)))  # move to the task
-    
+    direction = int(np.sign(task - robot_loc))
+    subschedule = list(range(robot_loc + direction, task + direction, direction)) if direction != 0 else []  # move to the task
     subschedule.extend([int(task)]*int(graph[task])) #add the task duration to the schedule
-    del subschedule[0] # remove the first element, which is the robot's current location
 
-    for other_robot in robot_schedules: # check if any other robot is at the same location at the same timestep
-        
-        if other_robot == robot:
-            continue
+    if instrumentation.enabled:
+        instrumentation.count("collision_checks")
 
-        # if the other robot's schedule is not long enough, we check if its latest location is between the robot and the task
-        if len(robot_schedules[other_robot]) < start_timestep + len(subschedule):
-            if robot_schedules[other_robot][-1] in subschedule[max(0, len(robot_schedules[other_robot]) - start_timestep):-1]:
-                return False
-            
-        # if the other robot's schedule is longer
-        if len(robot_schedules[other_robot]) > start_timestep + len(subschedule): 
-            #  # check if the final vertex is in the other robot's schedule aftewards
-            if subschedule[-1] in robot_schedules[other_robot][start_timestep + len(subschedule):]:
-                return False            
-
-        for i in range(len(subschedule)): # for each step in subschedule
-
-            # if the schedule of the other robot is long enough
-            if len(robot_schedules[other_robot]) > start_timestep + i:
-                # check the collision
-                if robot_schedules[other_robot][start_timestep + i] == subschedule[i]:
-                    return False
+    if not occupancy.is_free(robot, start_timestep, subschedule):
+        if instrumentation.enabled:
+            instrumentation.count("collision_rejections")
+        return False
 
+    occupancy.reserve(robot, start_timestep, subschedule)
     robot_schedules[robot].extend(subschedule) #finally, we add the subschedule to the robot's schedule
     return True  # if no collisions, return True
 
 
+# calculates a schedule on the path graph by assigning the closest (robot, task) pairs first
+# the candidate pairs are kept in a heap ordered by the finish time of the robot's current schedule plus the distance 
+# to the task, ties are broken by the order of the robots and the tasks. 
+# After each assignment only the pairs of the assigned robot get new keys, 
+# the pairs that were rejected in the meantime are tried again
 def Greedy_Algorithm(graph, robots):
 
-    task_locations = list(np.nonzero(graph)[0])
-    robot_task_pairs = [(a, b) for a in robots for b in task_locations]
-    robot_task_pairs.sort(key=lambda x: abs(x[0]-x[1]))  # sort by distance to the task
+    task_locations = list(graph_tasks(graph)[0])
 
     robot_schedules = {robot: [robot] for robot in robots}
-    assigned_tasks = []
+    occupancy = OccupancyIndex(robot_schedules)
+    assigned_tasks = set()
+
+    def pair_key(robot_idx, task_idx):
+        schedule = robot_schedules[robots[robot_idx]]
+        return abs(schedule[-1] - task_locations[task_idx]) + len(schedule)
 
-    while robot_task_pairs:
+    # version of the robot's schedule the heap entry was created for, older entries are skipped
+    versions = [0] * len(robots)
+    candidates = [(pair_key(a, b), a, b, 0) for a in range(len(robots)) for b in range(len(task_locations))]
+    heapq.heapify(candidates)
 
-        for robot, task in robot_task_pairs:
+    while len(assigned_tasks) < len(task_locations):
 
-            if task in assigned_tasks: #check if the task is already assigned
+        rejected = []
+        assigned_robot = None
+
+        while candidates:
+
+            key, robot_idx, task_idx, version = heapq.heappop(candidates)
+
+            if version != versions[robot_idx] or task_idx in assigned_tasks: #check if the entry is outdated or the task is already assigned
                 continue
 
-            if try_update_schedule(graph, robot_schedules, robot, task): #check if the schedule is collision-free and update it if so
-                
-                assigned_tasks.append(task)
-            
-                robot_task_pairs = [(a, b) for a in robots for b in task_locations if b not in assigned_tasks]
-                robot_task_pairs.sort(key=lambda x: abs(robot_schedules[x[0]][-1]-x[1]) + len(robot_schedules[x[0]]))
+            if try_update_schedule(graph, robot_schedules, robots[robot_idx], task_locations[task_idx], occupancy): #check if the schedule is collision-free and update it if so
+                assigned_tasks.add(task_idx)
+                assigned_robot = robot_idx
                 break
 
-    return max([len(schedule) for schedule in robot_schedules.values()]) - 1, list(robot_schedules.values())
\ No newline at end of file
+            rejected.append((key, robot_idx, task_idx, version))
+
+        if assigned_robot is None:
+            raise RuntimeError(f"Greedy_Algorithm cannot assign the remaining tasks for graph {graph} and robots {robots}")
+
+        versions[assigned_robot] += 1
+        for entry in rejected:
+            if entry[1] != assigned_robot:
+                heapq.heappush(candidates, entry)
+
+        for task_idx in range(len(task_locations)):
+            if task_idx not in assigned_tasks:
+                heapq.heappush(candidates, (pair_key(assigned_robot, task_idx), assigned_robot, task_idx, versions[assigned_robot]))
+
+    schedule = Schedule.from_robot_schedules(robot_schedules.values())
+
+    return schedule.makespan(), schedule
@@ -1,132 +1,463 @@
 import numpy as np
-import itertools
+import bisect
+import sys
+import instrumentation
+from schedule import Schedule, robot_path
+from sparse_graph import graph_tasks
 
 
-# constructs the schedule for one robot on the path graph
+# constructs the schedule for one robot on the path graph as the int32 array of its vertices
 # if return_schedule==False calculates the schedule's length only
 def C_1(graph, location_of_robot, return_schedule=False):
 
-    task_locations = list(np.nonzero(graph)[0])
+    if instrumentation.enabled:
+        instrumentation.count("C_1_calls")
+
+    task_locations, durations = graph_tasks(graph)
     if len(task_locations) == 0:
         return 0
     
     leftmost_task = task_locations[0]
     rightmost_task = task_locations[-1]
-    left_first = sum([graph[i] for i in task_locations]) + (rightmost_task - leftmost_task + abs(location_of_robot - leftmost_task ))
-    right_first = sum([graph[i] for i in task_locations]) + (rightmost_task - leftmost_task + abs(location_of_robot - rightmost_task))
+    left_first = durations.sum() + (rightmost_task - leftmost_task + abs(location_of_robot - leftmost_task ))
+    right_first = durations.sum() + (rightmost_task - leftmost_task + abs(location_of_robot - rightmost_task))
     
     if not return_schedule:
         return min(left_first, right_first), None
 
-    sorted_task_locations = task_locations.copy() if left_first < right_first else task_locations[::-1]
-    schedule = [location_of_robot]
+    stops = np.column_stack([task_locations, durations])
 
-    list_of_lists = [schedule]
+    # the int32 path of the robot built from its run-length segments, the moves to each task and the task duration
+    schedule = robot_path(location_of_robot, stops if left_first < right_first else stops[::-1])
 
-    for task in sorted_task_locations:
-        
-        last = list_of_lists[-1][-1]
-        if np.sign(task - last) > 0:
-            list_of_lists.append(range(last + 1, task + 1))
+    if int(min(left_first, right_first)) != len(schedule) - 1:
+        print(f"Error in C_1: {min(left_first, right_first)} != {len(schedule)} for graph {graph} and robot at {location_of_robot}", file=sys.stderr)
+
+    return len(schedule) - 1, schedule
+
+
+# precomputes the prefix sums of the tasks durations for the O(1) segment costs
+# <task_locations> is the sorted list of the task positions in <graph>, <graph> may be any mapping of the positions to the durations
+def segment_prefix_sums(graph, task_locations):
+
+    prefix = [0]
+    for task in task_locations:
+        prefix.append(prefix[-1] + graph[task])
+
+    return prefix
+
+
+# calculates the length of the C_1 schedule of one robot for the tasks r..l (inclusive) in O(1)
+# gives the same value as C_1 on the graph with all tasks outside of [r, l] removed
+def C_1_segment(prefix, task_locations, r, l, location_of_robot):
+
+    if l < r:
+        return 0
+
+    leftmost_task = task_locations[r]
+    rightmost_task = task_locations[l]
+    total_duration = prefix[l+1] - prefix[r]
+
+    return total_duration + (rightmost_task - leftmost_task) + min(abs(location_of_robot - leftmost_task),
+                                                                   abs(location_of_robot - rightmost_task))
+
+
+# constructs the C_1 schedule of one robot for the tasks r..l (inclusive) in O(l - r) without touching the rest of <graph>,
+# the same schedule as C_1 on the graph with all tasks outside of [r, l] removed
+# an empty segment (l < r) means that the robot stays stationary
+def C_1_segment_schedule(graph, task_locations, r, l, location_of_robot):
+
+    if l < r:
+        return robot_path(location_of_robot, [])
+
+    stops = [(task, graph[task]) for task in task_locations[r:l+1]]
+
+    # C_1 starts from the nearer end of the segment, from the rightmost task on a tie
+    if abs(location_of_robot - stops[0][0]) < abs(location_of_robot - stops[-1][0]):
+        return robot_path(location_of_robot, stops)
+
+    return robot_path(location_of_robot, stops[::-1])
+
+
+# finds the segments of tasks of all robots in the <split> table by backtracking from the (k-1, m) cell
+# split[c][l] is the first task of robot c when the robots 0..c cover the first l tasks
+# returns the list of pairs (r, l), robot c covers the tasks r..l (inclusive), l < r if it stays stationary
+def partition_segments(split, k, m):
+
+    segments = [None] * k
+    l = m
+
+    for c in range(k-1, -1, -1):
+        r = int(split[c][l])
+        segments[c] = (r, l-1)
+        l = r
+
+    return segments
+
+
+# rebuilds the Schedule of all robots from the <split> table
+def reconstruct_schedules(graph, robots, task_locations, split):
+
+    return Schedule.from_robot_schedules(C_1_segment_schedule(graph, task_locations, r, l, robots[c])
+                                         for c, (r, l) in enumerate(partition_segments(split, len(robots), len(task_locations))))
+
+
+# finds the best split for every prefix of tasks for robot c by scanning all the possible splits, O(m^2) per robot
+# split candidates are r in [lo, hi], the robot (c) covers the tasks r..l
+# returns the list of pairs (current_min, r_min) for l >= <start> before the stationary robot check
+def split_row_scan(prev_row, prefix, task_locations, robots, c, lo, hi, start=0):
+
+    row = []
+    for l in range(start, len(task_locations)): # for each task
+        current_min = float('inf')
+        r_min = 0
+
+        for r in range(lo, min(l, hi) + 1):
+
+            s_len = C_1_segment(prefix, task_locations, r, l, robots[c])
+            current_val = max(prev_row[r], s_len)
+
+            # if the current partition gives a shorter set of schedules we choose it
+            if current_val < current_min:
+
+                r_min = r
+                current_min = current_val
+
+            elif current_val == current_min:
+
+                # if the robot (c) is between (c-1) and task (r) it is better to assign r to c 
+                # to avoid collision in the case if c would become stationary robot
+                if abs(robots[c] - (task_locations[r])) < \
+                   abs(robots[c-1] - task_locations[r]):
+                        
+                        r_min = r
+
+        row.append((current_min, r_min))
+
+    if instrumentation.enabled:
+        instrumentation.count("C_1_calls", sum(max(0, min(l, hi) - lo + 1) for l in range(start, len(task_locations))))
+
+    return row
+
+
+# finds the same splits as split_row_scan in O(m log m) per robot
+# prev_row[r] is non-decreasing in r while the cost of the segment r..l is decreasing in r,
+# so max(prev_row[r], cost(r..l)) is minimal where the two functions cross. 
+# The crossing point only moves to the right with l, the tie range is found by a binary search.
+def split_row_bisect(prev_row, prefix, task_locations, robots, c, lo, hi, start=0):
+
+    # the tie-break of the scan prefers the last r of the ties that is closer to the robot (c) than to (c-1)
+    mid = (robots[c-1] + robots[c]) / 2
+
+    row = []
+    cross = lo
+    calls = 0
+    for l in range(start, len(task_locations)): # for each task
+
+        last = min(l, hi)
+        if last < lo:
+            row.append((float('inf'), 0))
+            continue
+
+        # the first split r where the robots 0..c-1 are not faster than the robot (c)
+        calls -= cross
+        while cross <= last and prev_row[cross] < C_1_segment(prefix, task_locations, cross, l, robots[c]):
+            cross += 1
+        calls += cross + (cross <= last) + (cross > lo)
+
+        left_val = C_1_segment(prefix, task_locations, cross - 1, l, robots[c]) if cross > lo else float('inf')
+        right_val = prev_row[cross] if cross <= last else float('inf')
+
+        if left_val < right_val:
+            row.append((left_val, cross - 1))
+            continue
+
+        # all the splits in [first_tie, last_tie] give the same value
+        first_tie = cross - 1 if left_val == right_val else cross
+        last_tie = bisect.bisect_right(prev_row, right_val, cross, last + 1) - 1
+
+        if robots[c-1] < robots[c]:
+            closer = last_tie if task_locations[last_tie] > mid else first_tie
         else:
-            list_of_lists.append(range(last - 1, task - 1, -1))
+            closer = min(last_tie, bisect.bisect_left(task_locations, mid) - 1)
         
-        list_of_lists.append([int(task)]*int(graph[task]))  # add the task duration to the schedule
+        row.append((right_val, closer if closer > first_tie else first_tie))
 
-    schedule = list(itertools.chain.from_iterable(list_of_lists))
+    if instrumentation.enabled:
+        instrumentation.count("C_1_calls", calls)
 
-    if int(min(left_first, right_first)) != len(schedule) - 1:
-        print(f"Error in C_1: {min(left_first, right_first)} != {len(schedule)} for graph {graph} and robot at {location_of_robot}")
+    return row
+
+
+SCAN_ENGINE = "scan"
+BISECT_ENGINE = "bisect"
+
+split_row_engines = {SCAN_ENGINE: split_row_scan,
+                     BISECT_ENGINE: split_row_bisect}
 
-    return len(schedule) - 1, schedule
 
 # calculates the near-optimal schedule on the path graph
 # <graph> is an array of integer numbers, i.e. [0 1 3 0 0 0 0],
 # containing either the task duration 
-# or 0 for vertices with no tasks
+# or 0 for vertices with no tasks, or the SparseGraph of the same tasks
 # <robots> is the list of robots starting positions
-def Partition_Algorithm(graph, robots):
+# <engine> is the way to find the best splits, "scan" for the reference O(k m^2) one or "bisect" for O(k m log m)
+def Partition_Algorithm(graph, robots, engine=SCAN_ENGINE):
+
+    if engine not in split_row_engines:
+        raise ValueError(f"Unknown Partition engine {engine}")
 
     k = len(robots)
-    task_locations = list(np.nonzero(graph)[0])
+    task_locations = list(graph_tasks(graph)[0])
     m = len(task_locations)
     S = np.zeros(shape=(k, m+1))
-    split = np.zeros(shape=(k, m+1))
-    split_point = 0
+    split = np.zeros(shape=(k, m+1), dtype=int)
+    prefix = segment_prefix_sums(graph, task_locations)
 
-    all_schedules = {'(0, 0)': [[robots[0]]]}
+    fill_tables(S, split, len(graph), robots, task_locations, prefix, engine)
 
-    # fill in <all tasks for one> schedules
-    for l in range(m):
-        S[0][l+1], schedule = C_1(graph[:task_locations[l]+1], robots[0], return_schedule=True)
-        all_schedules[str((0, l+1))] = [schedule]
+    res_schedule = reconstruct_schedules(graph, robots, task_locations, split)
 
-    # fill in <empty> schedules
-    for c in range(1, k):
-        all_schedules[str((c, 0))] = [[robots[c]]] 
+    return int(S[k-1][m]), res_schedule
 
-    # the main loop with the auxiliary S table filled in
-    for c in range(1, k): # for each robot
-        for l in range(m): # for each task
-            current_min = float('inf')
-            r_min = 0
 
-            for r in range(l+1):
+# fills in the S and split tables of the Partition_Algorithm for the robots c >= <first_robot> and the prefixes of
+# l >= <first_task> + 1 tasks, the rest of the tables must be already filled in for the current tasks and robots
+# <n> is the number of vertices in the path
+def fill_tables(S, split, n, robots, task_locations, prefix, engine, first_robot=0, first_task=0):
 
-                # first c-1 vertices are not available for the partition for c as we have c-1 robots on the left
-                if task_locations[r] <= c-1:
-                    continue
+    k = len(robots)
+    m = len(task_locations)
 
-                # last k - (c+1) vertices are not available for the partition as well
-                if task_locations[r] > len(graph) - 1 - (k - c - 1):
-                    break
+    # fill in <all tasks for one> schedules, robot 0 always starts its segment from the first task
+    if first_robot == 0:
+        for l in range(first_task, m):
+            S[0][l+1] = C_1_segment(prefix, task_locations, 0, l, robots[0])
 
-                temp_graph = np.asarray(graph.copy())
-                temp_graph[0:task_locations[r]] = 0
-                temp_graph[task_locations[l]+1:len(graph)] = 0
+    if instrumentation.enabled:
+        instrumentation.count("C_1_calls", m - first_task if first_robot == 0 else 0)
+        instrumentation.count("dp_cells", (k - first_robot) * (m - first_task))
 
-                s_len, schedule = C_1(temp_graph, robots[c], return_schedule=False)
-                current_val = max(S[c-1][r], s_len)
-            
-                # if the current partition gives a shorter set of schedules we choose it
-                if current_val < current_min:
+    # the main loop with the auxiliary S table filled in
+    for c in range(max(1, first_robot), k): # for each robot
 
-                    r_min = r
-                    current_min = current_val
+        # first c-1 vertices are not available for the partition for c as we have c-1 robots on the left
+        lo = bisect.bisect_right(task_locations, c-1)
+        # last k - (c+1) vertices are not available for the partition as well
+        hi = bisect.bisect_right(task_locations, n - 1 - (k - c - 1)) - 1
 
-                elif current_val == current_min:
+        prev_row = S[c-1].tolist()
+        row = split_row_engines[engine](prev_row, prefix, task_locations, robots, c, lo, hi, first_task)
 
-                    # if the robot (c) is between (c-1) and task (r) it is better to assign r to c 
-                    # to avoid collision in the case if c would become stationary robot
-                    if abs(robots[c] - (task_locations[r])) < \
-                       abs(robots[c-1] - task_locations[r]):
-                            
-                            r_min = r
+        for l, (current_min, r_min) in enumerate(row, first_task):
 
             # if robot (c) stays stationary
-            if S[c-1][l+1] < current_min or \
-                (S[c-1][l+1] == current_min and abs(robots[c] - task_locations[r_min]) > \
-                                                abs(robots[c-1] - task_locations[r_min])):
+            if prev_row[l+1] < current_min or \
+                (prev_row[l+1] == current_min and abs(robots[c] - task_locations[r_min]) > \
+                                                  abs(robots[c-1] - task_locations[r_min])):
 
                 r_min = l+1
-                current_min = S[c-1][r_min]
-                schedule = [robots[c]]
-                
-            # if robot (c) has a non-empty schedule
-            else:
+                current_min = prev_row[r_min]
+
+            split[c][l+1] = r_min
+            S[c][l+1] = current_min
 
-                temp_graph = np.asarray(graph.copy())
-                temp_graph[0:task_locations[r_min]] = 0
-                temp_graph[task_locations[l]+1:len(graph)] = 0
 
-                s_len, schedule = C_1(temp_graph, robots[c], return_schedule=True)
+# calculates the Partition_Algorithm schedules for a batch of instances of the same shape at once
+# <graphs> is a (B, n) array of the tasks durations or a sequence of B dense or sparse graphs,
+# every instance must have the same number of tasks m
+# <robots> is a (B, k) array of the robots starting positions
+# the S and split tables of all the instances are filled in with O(k) vectorized operations on (B, m, m) arrays
+# returns the array of the schedules lengths and the list of the schedules if return_schedules==True
+def Partition_Algorithm_Batch(graphs, robots, return_schedules=False):
 
-            split_point = r_min
-            all_schedules[str((c, l+1))] = all_schedules[str((c-1, r_min))] + [schedule]
+    robots = np.asarray(robots)
+    B, k = robots.shape
 
-            split[c][l+1] = split_point
-            S[c][l+1] = current_min
+    tasks = [graph_tasks(graph) for graph in graphs]
+    task_counts = np.array([len(task_locations) for task_locations, _ in tasks])
+    if np.any(task_counts != task_counts[0]):
+        raise ValueError("All the instances in the batch must have the same number of tasks")
+    m = int(task_counts[0]) if B > 0 else 0
+
+    # task_locations[b] is the sorted list of the task positions of instance b, n[b] is its number of vertices
+    task_locations = np.array([locations for locations, _ in tasks], dtype=int).reshape(B, m)
+    durations = np.array([d for _, d in tasks]).reshape(B, m)
+    n = np.array([len(graph) for graph in graphs]).reshape(B, 1)
+    prefix = np.concatenate([np.zeros((B, 1)), np.cumsum(durations, axis=1)], axis=1)
+
+    S = np.zeros(shape=(B, k, m+1))
+    split = np.zeros(shape=(B, k, m+1), dtype=int)
+
+    if m > 0:
+
+        # segment[b, r, l] is the segment r..l (inclusive) without the robot part of C_1, inf for l < r
+        r_idx = np.arange(m)[:, None]
+        l_idx = np.arange(m)[None, :]
+        left = task_locations[:, :, None]
+        right = task_locations[:, None, :]
+        segment = (prefix[:, None, 1:] - prefix[:, :-1, None]) + (right - left)
+        segment = np.where(r_idx <= l_idx, segment, np.inf)
+
+        def segment_costs(c):
+            position = robots[:, c, None, None]
+            return segment + np.minimum(np.abs(position - left), np.abs(position - right))
+
+        # fill in <all tasks for one> schedules, robot 0 always starts its segment from the first task
+        S[:, 0, 1:] = segment_costs(0)[:, 0, :]
+
+        for c in range(1, k): # for each robot
+
+            prev_row = S[:, c-1, :]
+
+            # first c-1 vertices and last k - (c+1) vertices are not available for the partition for c
+            valid = (task_locations > c-1) & (task_locations <= n - 1 - (k - c - 1))
+            valid = valid[:, :, None] & (r_idx <= l_idx)[None, :, :]
+
+            # vals[b, r, l] = max(S[c-1][r], C_1(r..l)) for every split r of every prefix l
+            vals = np.maximum(prev_row[:, :m, None], segment_costs(c))
+            vals = np.where(valid, vals, np.inf)
+
+            current_min = vals.min(axis=1)
+            ties = (vals == current_min[:, None, :]) & valid
+            first_tie = ties.argmax(axis=1)
+
+            # the scan prefers the last tie after the first one if the robot (c) is closer to it than (c-1)
+            closer = np.abs(robots[:, c, None] - task_locations) < np.abs(robots[:, c-1, None] - task_locations)
+            later_ties = ties & closer[:, :, None] & (r_idx > first_tie[:, None, :])
+            has_later = later_ties.any(axis=1)
+            last_later = m - 1 - later_ties[:, ::-1, :].argmax(axis=1)
+            r_min = np.where(has_later, last_later, first_tie)
+
+            # if robot (c) stays stationary
+            r_min_location = np.take_along_axis(task_locations, r_min, axis=1)
+            stationary = (prev_row[:, 1:] < current_min) | \
+                         ((prev_row[:, 1:] == current_min) & (np.abs(robots[:, c, None] - r_min_location) > \
+                                                              np.abs(robots[:, c-1, None] - r_min_location)))
+
+            split[:, c, 1:] = np.where(stationary, np.arange(1, m+1), r_min)
+            S[:, c, 1:] = np.where(stationary, prev_row[:, 1:], current_min)
+
+    if instrumentation.enabled:
+        instrumentation.count("C_1_calls", B * k * m * m if m > 0 else 0)
+        instrumentation.count("dp_cells", B * k * m)
+
+    lengths = S[:, k-1, m].astype(int)
+
+    if not return_schedules:
+        return lengths, None
+
+    schedules = [reconstruct_schedules(graphs[b], robots[b].tolist(), list(task_locations[b]), split[b]) for b in range(B)]
+
+    return lengths, schedules
+
+
+# the incremental Partition_Algorithm for the changing tasks and robots positions
+# keeps the S and split tables and recomputes only the cells affected by a change:
+# the columns of the task prefixes that include the added or removed task, or the rows of the moved robot and the robots after it
+# the planner state is always the same as the one of Partition_Algorithm(graph, robots, engine) for the current graph and robots
+class PartitionPlanner:
+
+    def __init__(self, graph, robots, engine=SCAN_ENGINE):
+
+        if engine not in split_row_engines:
+            raise ValueError(f"Unknown Partition engine {engine}")
+
+        # the tasks are kept sparse: the durations by the positions, <n> is the number of vertices
+        task_locations, durations = graph_tasks(graph)
+        self.n = len(graph)
+        self.durations = dict(zip(task_locations.tolist(), durations.astype(float).tolist()))
+        self.robots = [int(r) for r in robots]
+        self.engine = engine
+
+        self.task_locations = task_locations.tolist()
+        self.prefix = segment_prefix_sums(self.durations, self.task_locations)
+        self.S = np.zeros(shape=(len(self.robots), len(self.task_locations)+1))
+        self.split = np.zeros(shape=(len(self.robots), len(self.task_locations)+1), dtype=int)
+
+        fill_tables(self.S, self.split, self.n, self.robots, self.task_locations, self.prefix, self.engine)
+
+        self.segment_keys = [None] * len(self.robots)
+        self.schedules = [None] * len(self.robots)
+        self.update_schedules()
+
+    # the length of the current schedule
+    def makespan(self):
+
+        return int(self.S[len(self.robots)-1][len(self.task_locations)])
+
+    # rebuilds the schedules of the robots whose segments of tasks changed
+    # returns the dict {robot index: new schedule}
+    def update_schedules(self):
+
+        changed = {}
+
+        for c, (r, l) in enumerate(partition_segments(self.split, len(self.robots), len(self.task_locations))):
+
+            # the schedule of a robot depends only on its position and the positions and durations of its tasks
+            key = (self.robots[c], tuple(self.task_locations[r:l+1]), tuple(self.durations[t] for t in self.task_locations[r:l+1]))
+            if key != self.segment_keys[c]:
+                self.segment_keys[c] = key
+                self.schedules[c] = C_1_segment_schedule(self.durations, self.task_locations, r, l, self.robots[c])
+                changed[c] = self.schedules[c]
+
+        return changed
+
+    # recomputes the prefix sums and the table columns from the task index <first_task>
+    def update_tasks(self, first_task):
+
+        for j in range(first_task, len(self.task_locations)):
+            self.prefix[j+1] = self.prefix[j] + self.durations[self.task_locations[j]]
+
+        fill_tables(self.S, self.split, self.n, self.robots, self.task_locations, self.prefix, self.engine,
+                    first_task=first_task)
+
+        return self.makespan(), self.update_schedules()
+
+    # adds the task of <duration> at <position>, the duration of the task already at the position is replaced
+    # returns the new makespan and the dict {robot index: new schedule} of the changed schedules
+    def add_task(self, position, duration):
+
+        if duration <= 0:
+            raise ValueError(f"The task duration must be positive, got {duration}")
+
+        j = bisect.bisect_left(self.task_locations, position)
+
+        if j == len(self.task_locations) or self.task_locations[j] != position:
+            self.task_locations.insert(j, int(position))
+            self.prefix.append(0)
+            self.S = np.insert(self.S, j+1, 0, axis=1)
+            self.split = np.insert(self.split, j+1, 0, axis=1)
+
+        self.durations[int(position)] = duration
+
+        return self.update_tasks(j)
+
+    # removes the task at <position>
+    # returns the new makespan and the dict {robot index: new schedule} of the changed schedules
+    def remove_task(self, position):
+
+        j = bisect.bisect_left(self.task_locations, position)
+        if j == len(self.task_locations) or self.task_locations[j] != position:
+            raise ValueError(f"There is no task at {position}")
+
+        del self.task_locations[j]
+        self.prefix.pop()
+        self.S = np.delete(self.S, j+1, axis=1)
+        self.split = np.delete(self.split, j+1, axis=1)
+        del self.durations[int(position)]
+
+        return self.update_tasks(j)
+
+    # moves the robot with the index <robot> to <position>, the robots keep their indices
+    # returns the new makespan and the dict {robot index: new schedule} of the changed schedules
+    def move_robot(self, robot, position):
+
+        if position in self.robots[:robot] + self.robots[robot+1:]:
+            raise ValueError(f"Another robot is already at {position}")
 
-    res_schedule = all_schedules[str((k-1, m))]
+        self.robots[robot] = int(position)
+        fill_tables(self.S, self.split, self.n, self.robots, self.task_locations, self.prefix, self.engine,
+                    first_robot=robot)
 
-    return int(S[k-1][m]), res_schedule
\ No newline at end of file
+        return self.makespan(), self.update_schedules()
@@ -1,49 +1,142 @@
-import numpy as np
 import random
-from Greedy_Algorithm import try_update_schedule
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import instrumentation
+from schedule import Schedule
+from sparse_graph import graph_tasks
+from Greedy_Algorithm import try_update_schedule, OccupancyIndex
 
 
-# calculates a schedule on the path graph
-# <graph> is an array of integer numbers, i.e. [0 1 3 0 0 0 0],
-# containing either the task duration 
-# or 0 for vertices with no tasks
-# <robots> is the list of robots starting positions
-# def Random_Algorithm(graph, robots, attempt=0):
-def Random_Algorithm(graph, robots):
+# calculates one random schedule on the path graph using the random generator <rng> 
+# returns None if the attempt gets stuck, i.e. no remaining (robot, task) pair can be added without collisions,
+# or if it is not finished by the time.time() <deadline> (no limit if None)
+def Random_Attempt(graph, robots, rng, deadline=None):
 
-    task_locations = list(np.nonzero(graph)[0])
+    task_locations = list(graph_tasks(graph)[0])
     robot_task_pairs = [(a, b) for a in robots for b in task_locations]
     # randomize pairs
-    random.shuffle(robot_task_pairs)
+    rng.shuffle(robot_task_pairs)
 
     robot_schedules = {robot: [robot] for robot in robots}
+    occupancy = OccupancyIndex(robot_schedules)
     assigned_tasks = []
 
     while robot_task_pairs:
 
-        # updated = False
         for robot, task in robot_task_pairs:
 
+            if deadline is not None and time.time() > deadline:
+                return None
+
             if task in assigned_tasks: #check if the robot is already done or the task is already assigned
                 continue
 
-            if try_update_schedule(graph, robot_schedules, robot, task): #check if the schedule is collision-free and update it if so
+            if try_update_schedule(graph, robot_schedules, robot, task, occupancy): #check if the schedule is collision-free and update it if so
                 
-                # updated = True
                 assigned_tasks.append(task)
                 available_task_locations = [t for t in task_locations if t not in assigned_tasks]
-                random.shuffle(available_task_locations)
+                rng.shuffle(available_task_locations)
 
-                if available_task_locations is None:
-                    robot_task_pairs = None
-                else:
-                    robot_task_pairs = [(a, b) for a in robots for b in available_task_locations]
-                    robot_task_pairs.sort(key=lambda x: len(robot_schedules[x[0]]))
+                robot_task_pairs = [(a, b) for a in robots for b in available_task_locations]
+                robot_task_pairs.sort(key=lambda x: len(robot_schedules[x[0]]))
                 
                 break
 
-        #if the algorithm stuck and cannot assign any more tasks, we restart it
-        # if not updated:
-        #     return Random_Algorithm(graph, robots, attempt=attempt+1)
+        else:
+            #the algorithm is stuck and cannot assign any more tasks
+            return None
+
+    schedule = Schedule.from_robot_schedules(robot_schedules.values())
+
+    return schedule.makespan(), schedule
+
+
+# calculates a schedule on the path graph
+# <graph> is an array of integer numbers, i.e. [0 1 3 0 0 0 0],
+# containing either the task duration 
+# or 0 for vertices with no tasks, or the SparseGraph of the same tasks
+# <robots> is the list of robots starting positions
+# <rng> is the random generator, the global <random> state is used if None
+# if the algorithm gets stuck it is restarted, up to <max_attempts> times in total
+def Random_Algorithm(graph, robots, rng=None, max_attempts=100):
+
+    rng = random if rng is None else rng
+
+    for attempt in range(max_attempts):
+
+        if attempt > 0 and instrumentation.enabled:
+            instrumentation.count("restarts")
+
+        result = Random_Attempt(graph, robots, rng)
+        if result is not None:
+            return result
+
+    raise RuntimeError(f"Random_Algorithm is stuck {max_attempts} times for graph {graph} and robots {robots}")
+
+
+# one restart of the portfolio with its own seeded random generator, it is stopped at the time.time() <deadline>
+# returns (seed, length, schedule, time), length and schedule are None if the restart got stuck,
+# None if it is stopped at the deadline
+def Random_Restart(graph, robots, seed, deadline=None):
+
+    start_time = time.time()
+    result = Random_Attempt(graph, robots, random.Random(seed), deadline)
+    if result is None and deadline is not None and time.time() > deadline:
+        return None
+    length, schedule = result if result is not None else (None, None)
+
+    return seed, length, schedule, time.time() - start_time
+
+
+# runs <restarts> seeded Random_Attempt restarts with the seeds seed, seed+1, ... on a pool of <processes> processes
+# and returns the shortest schedule found within <time_budget> seconds (no limit if None)
+# returns (length, schedule, stats), stats is the list of (seed, length, time) of the finished restarts, 
+# length is None for the restarts that got stuck
+def Random_Portfolio(graph, robots, restarts, seed=0, processes=None, time_budget=None):
+
+    start_time = time.time()
+    deadline = None if time_budget is None else start_time + time_budget
+    results = []
+
+    if processes == 1:
+
+        for s in range(seed, seed + restarts):
+            if deadline is not None and time.time() > deadline:
+                break
+            results.append(Random_Restart(graph, robots, s, deadline))
+
+    else:
+
+        executor = ProcessPoolExecutor(max_workers=processes)
+        pending = {executor.submit(Random_Restart, graph, robots, s, deadline) for s in range(seed, seed + restarts)}
+
+        while pending:
+
+            timeout = None if time_budget is None else max(0, time_budget - (time.time() - start_time))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            results.extend(future.result() for future in done)
+
+            if not done:
+                break
+
+        # the restarts that are not started within the budget are cancelled and the running ones stop at the deadline,
+        # so the pool processes exit right after the budget
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    # the restarts stopped at the deadline are not finished
+    results = [r for r in results if r is not None]
+
+    # the collision counters of the restarts in the pool processes are not collected,
+    # the restarts counter is the number of the finished attempts after the first one, as in Random_Algorithm
+    if instrumentation.enabled:
+        instrumentation.count("restarts", max(len(results) - 1, 0))
+
+    stats = [(s, length, t) for s, length, _, t in sorted(results, key=lambda x: x[0])]
+    finished = [r for r in results if r[1] is not None]
+
+    if not finished:
+        raise RuntimeError(f"Random_Portfolio found no schedule in {len(results)} restarts for graph {graph} and robots {robots}")
+
+    _, length, schedule, _ = min(finished, key=lambda x: (x[1], x[0]))
 
-    return max([len(schedule) for schedule in robot_schedules.values()]) - 1, list(robot_schedules.values())
\ No newline at end of file
+    return length, schedule, stats
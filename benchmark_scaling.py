@@ -0,0 +1,275 @@
+import argparse
+import importlib
+import json
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from generate_instances import generate_random_instance, generate_tasks_durations, generate_positions
+
+# the modules and the functions of the scheduling algorithms by the algorithm letter,
+# they are called directly so that the benchmark also runs on the older checkouts
+ALGORITHMS = {"p": ("Partition_Algorithm", "Partition_Algorithm"),
+              "i": ("robot_scheduling_ILP", "Optimize_Robot_Scheduling"),
+              "g": ("Greedy_Algorithm", "Greedy_Algorithm"),
+              "r": ("Random_Algorithm", "Random_Algorithm")}
+
+DURATION_DISTRIBUTIONS = ["equal", "uniform", "uneven_uniform", "normal"]
+
+# the fields that identify a benchmark point
+POINT_KEYS = ("family", "n", "k", "m", "dur", "distr", "algo")
+
+
+# lists the benchmark points, a point is the dict with the family name and the instance parameters
+# the "n" families vary the path length for each durations distribution with <robots_fraction> and <tasks_fraction> of n
+# robots and tasks, the "k" and "m" families vary the number of robots and tasks on the path with <base_n> vertices
+def benchmark_points(sizes, robots, tasks, base_n, dur, distrs, robots_fraction=0.1, tasks_fraction=0.5):
+
+    points = []
+
+    for distr in distrs:
+        for n in sizes:
+            points.append({"family": f"n/{distr}", "n": n, "k": max(2, int(n * robots_fraction)),
+                           "m": max(1, int(n * tasks_fraction)), "dur": dur, "distr": distr})
+
+    for k in robots:
+        points.append({"family": "k", "n": base_n, "k": k, "m": max(1, int(base_n * tasks_fraction)), "dur": dur, "distr": distrs[0]})
+
+    for m in tasks:
+        points.append({"family": "m", "n": base_n, "k": max(2, int(base_n * robots_fraction)), "m": m, "dur": dur, "distr": distrs[0]})
+
+    return [p for p in points if p["k"] < p["n"] and p["m"] <= p["n"]]
+
+
+# the deterministic seed of the instance of the point, it depends only on the benchmark seed and the point parameters
+def instance_seed(seed, point, instance_id):
+
+    return int(np.random.SeedSequence([seed, point["n"], point["k"], point["m"], point["dur"],
+                                       DURATION_DISTRIBUTIONS.index(point["distr"]), instance_id]).generate_state(1)[0])
+
+
+# generates the seeded instance and robots positions of the point
+def generate_point_instance(seed, point, instance_id):
+
+    random.seed(instance_seed(seed, point, instance_id))
+    np.random.seed(instance_seed(seed, point, instance_id))
+
+    tasks_durations = generate_tasks_durations(point["dur"], point["m"], point["distr"])
+    instance = generate_random_instance(point["n"], tasks_durations)
+    robots = [int(r) for r in generate_positions(point["n"], point["k"])]
+
+    return instance, robots
+
+
+# runs the algorithm <a> once, the random generators are seeded so that the Random_Algorithm runs are repeatable
+# returns the schedule length
+def run_algorithm(a, function, instance, robots, seed, licence=None):
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    if a == "i":
+        tasks = [(int(task), int(instance[task])) for task in np.nonzero(instance)[0]]
+        length, _ = function(len(instance), tasks, robots, license=licence)
+    else:
+        length, _ = function(instance, robots)
+
+    return int(length)
+
+
+# measures the algorithm <a> on <instances> instances of the point
+# the runtime is the median over the instances of the fastest of <repeats> runs, the peak memory is measured with
+# tracemalloc in a separate run, as tracing slows the algorithms down, the makespan is the mean schedule length
+def measure_point(a, function, point, instances, repeats, seed, memory=True, licence=None):
+
+    times, peaks, lengths = [], [], []
+
+    for instance_id in range(instances):
+
+        instance, robots = generate_point_instance(seed, point, instance_id)
+        run_seed = instance_seed(seed, point, instance_id)
+
+        best_time = float("inf")
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            length = run_algorithm(a, function, instance, robots, run_seed, licence)
+            best_time = min(best_time, time.perf_counter() - start_time)
+
+        times.append(best_time)
+        lengths.append(length)
+
+        if memory:
+            tracemalloc.start()
+            run_algorithm(a, function, instance, robots, run_seed, licence)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    return {**point, "algo": a, "time": float(np.median(times)), "peak_memory": int(max(peaks)) if peaks else None,
+            "makespan": float(np.mean(lengths))}
+
+
+# runs the benchmark of the algorithms <algos> on all the points, the IP only on the points with at most
+# <ilp_max_vertices> vertices, returns the list of the measurements
+def run_benchmark(algos, points, instances, repeats, seed, memory=True, ilp_max_vertices=12, licence=None):
+
+    results = []
+
+    for a in algos:
+
+        module_name, function_name = ALGORITHMS[a]
+        function = getattr(importlib.import_module(module_name), function_name)
+
+        for point in points:
+
+            if a == "i" and point["n"] > ilp_max_vertices:
+                continue
+
+            result = measure_point(a, function, point, instances, repeats, seed, memory, licence)
+            results.append(result)
+            print(f"{a} {point['family']:>20} n={point['n']:<6} k={point['k']:<4} m={point['m']:<6} "
+                  f"time {result['time'] * 1000:10.2f} ms  "
+                  f"peak {(result['peak_memory'] or 0) / 2**20:8.2f} MiB  makespan {result['makespan']:.1f}", flush=True)
+
+    return results
+
+
+# the scaling exponent of the runtime in each family: the slope of log(time) over log(varied parameter)
+# returns the dict {(family, algo): exponent}
+def scaling_exponents(results):
+
+    varied = lambda family: "n" if family.startswith("n/") else family
+    curves = {}
+    for r in results:
+        curves.setdefault((r["family"], r["algo"]), []).append((r[varied(r["family"])], r["time"]))
+
+    exponents = {}
+    for key, curve in curves.items():
+        xs, ys = zip(*sorted(curve))
+        if len(set(xs)) > 1 and min(ys) > 0:
+            exponents[key] = float(np.polyfit(np.log(xs), np.log(ys), 1)[0])
+
+    return exponents
+
+
+# compares the results with the baseline results of the same points
+# a point regresses if its runtime or makespan grows by more than <threshold> (relative),
+# the runtimes below <min_time> seconds in both runs are ignored as noise
+# returns the list of the regression descriptions
+def compare_results(results, baseline, threshold, min_time=1e-3):
+
+    baseline = {tuple(r[key] for key in POINT_KEYS): r for r in baseline}
+    regressions = []
+
+    for r in results:
+
+        old = baseline.get(tuple(r[key] for key in POINT_KEYS))
+        if old is None:
+            continue
+
+        name = " ".join(f"{key}={r[key]}" for key in POINT_KEYS)
+        if max(r["time"], old["time"]) >= min_time and r["time"] > old["time"] * (1 + threshold):
+            regressions.append(f"{name}: time {r['time'] * 1000:.2f} ms, baseline {old['time'] * 1000:.2f} ms")
+        if r["makespan"] > old["makespan"] * (1 + threshold):
+            regressions.append(f"{name}: makespan {r['makespan']:.1f}, baseline {old['makespan']:.1f}")
+
+    return regressions
+
+
+# plots the runtime scaling curves of all the families into <path>
+def plot_curves(results, path):
+
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        raise ImportError("The plots require matplotlib: pip install matplotlib")
+
+    families = sorted({r["family"] for r in results})
+    fig, axes = plt.subplots(1, len(families), figsize=(4 * len(families), 4), squeeze=False)
+
+    for ax, family in zip(axes[0], families):
+
+        varied = "n" if family.startswith("n/") else family
+        for a in sorted({r["algo"] for r in results if r["family"] == family}):
+            curve = sorted((r[varied], r["time"]) for r in results if r["family"] == family and r["algo"] == a)
+            ax.loglog(*zip(*curve), marker="o", label=a)
+
+        ax.set_title(family)
+        ax.set_xlabel(varied)
+        ax.set_ylabel("time, s")
+        ax.legend()
+
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the scheduling algorithms')
+    parser.add_argument("--algos", type=str, default="pgr",
+                        help="The algorithms to benchmark: p - Partition, i - IP, g - Greedy, r - Random")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25, 50, 100, 200, 400],
+                        help="The path lengths of the n families")
+    parser.add_argument("--robots", type=int, nargs="+", default=[2, 4, 8, 16, 32],
+                        help="The numbers of robots of the k family")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 20, 40, 80],
+                        help="The numbers of tasks of the m family")
+    parser.add_argument("--base_n", type=int, default=100,
+                        help="The path length of the k and m families")
+    parser.add_argument("--dur", type=int, default=10,
+                        help="The durations parameter")
+    parser.add_argument("--distrs", type=str, nargs="+", default=["equal", "uniform"], choices=DURATION_DISTRIBUTIONS,
+                        help="The durations distributions of the n families, the first one is used for the k and m families")
+    parser.add_argument("--instances", type=int, default=3,
+                        help="The number of instances of each point")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="The number of the timed runs of each instance")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The random seed of the instances")
+    parser.add_argument("--no_memory", action="store_true",
+                        help="Do not measure the peak memory")
+    parser.add_argument("--ilp_max_vertices", type=int, default=12,
+                        help="The IP is run only on the points with at most this number of vertices")
+    parser.add_argument("--repo", type=str, default=None,
+                        help="The checkout to import the algorithms from, the current directory by default")
+    parser.add_argument("--output", type=str, default="benchmark.json",
+                        help="The JSON file for the results")
+    parser.add_argument("--plot", type=str, default=None,
+                        help="The image file for the scaling curves (requires matplotlib)")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="The JSON results of the baseline checkout to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="The relative slowdown (or makespan growth) treated as a regression")
+
+    args = parser.parse_args()
+
+    if args.repo is not None:
+        sys.path.insert(0, args.repo)
+
+    points = benchmark_points(args.sizes, args.robots, args.tasks, args.base_n, args.dur, args.distrs)
+    results = run_benchmark(args.algos, points, args.instances, args.repeats, args.seed,
+                            memory=not args.no_memory, ilp_max_vertices=args.ilp_max_vertices)
+
+    with open(args.output, "w") as f:
+        json.dump({"repo": args.repo or ".", "seed": args.seed, "results": results}, f, indent=1)
+
+    for (family, a), exponent in sorted(scaling_exponents(results).items()):
+        print(f"{a} {family}: time ~ {'n' if family.startswith('n/') else family}^{exponent:.2f}")
+
+    if args.plot is not None:
+        plot_curves(results, args.plot)
+
+    if args.baseline is not None:
+
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare_results(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        print(f"{len(regressions)} regressions beyond {args.threshold:.0%}")
+
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,42 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+# measures the wall time of starting a fresh interpreter and running <code> in it, <repeats> times
+# returns the list of the times in seconds
+def startup_times(code, repeats=10):
+
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        times.append(time.perf_counter() - start_time)
+
+    return times
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Startup time of run.py for the algorithms strings')
+    parser.add_argument("--algos", type=str, nargs="+", default=["p", "g", "pgr", "pigr"],
+                        help="The algorithms strings to measure the startup for")
+    parser.add_argument("--repeats", type=int, default=10,
+                        help="The number of the measurements for each algorithms string")
+
+    args = parser.parse_args()
+
+    baseline = statistics.median(startup_times("pass", args.repeats))
+    print(f"python startup: {baseline * 1000:.1f} ms")
+
+    for algos in args.algos:
+
+        # the import of run.py and the modules of the selected algorithms, as at the start of an experiment
+        code = f"import run\nfor a in {algos!r}:\n    run.load_algorithm(a)"
+        try:
+            median = statistics.median(startup_times(code, args.repeats))
+            print(f"algos {algos}: {median * 1000:.1f} ms ({(median - baseline) * 1000:.1f} ms over python startup)")
+        except subprocess.CalledProcessError:
+            print(f"algos {algos}: failed, the modules of the algorithms cannot be imported")
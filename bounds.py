@@ -0,0 +1,74 @@
+import numpy as np
+from sparse_graph import graph_tasks
+
+# the lower bounds of the schedule length on the path graph
+# <graph> is the array of the tasks durations (0 for the vertices without tasks) or the SparseGraph, <robots> is the list of the robots positions
+# a task of duration d at p is completed when a robot arrives at p and stays there for d more timesteps,
+# so it takes at least the distance to p plus d timesteps. The bounds do not assume that the robots keep their order
+# on the path, so they are also valid for the IP that allows the robots to traverse the same edge in opposite directions.
+
+
+# the longest single task: max over the tasks of the duration plus the distance from the nearest robot
+def task_bound(task_locations, durations, robots):
+
+    if len(task_locations) == 0:
+        return 0
+
+    robots = np.sort(np.asarray(robots))
+    idx = np.searchsorted(robots, task_locations)
+    left = np.abs(task_locations - robots[np.maximum(idx - 1, 0)])
+    right = np.abs(task_locations - robots[np.minimum(idx, len(robots) - 1)])
+
+    return int(np.max(durations + np.minimum(left, right)))
+
+
+# the total work: each robot stays at the tasks for at most L timesteps of the schedule of length L
+def work_bound(durations, k):
+
+    return int(-(-int(np.sum(durations)) // k))
+
+
+# the tasks on one side of all the robots: every robot that works there first travels at least from the outermost robot
+# to the nearest task of the side, and the k robots share the work of the side
+# returns the pair of the bounds for the left and the right side
+def side_bounds(task_locations, durations, robots):
+
+    left = task_locations < min(robots)
+    right = task_locations > max(robots)
+
+    left_bound = int(min(robots) - task_locations[left].max()) + work_bound(durations[left], len(robots)) if np.any(left) else 0
+    right_bound = int(task_locations[right].min() - max(robots)) + work_bound(durations[right], len(robots)) if np.any(right) else 0
+
+    return left_bound, right_bound
+
+
+# the best of the lower bounds of the schedule length
+def lower_bound(graph, robots):
+
+    task_locations, durations = graph_tasks(graph)
+    durations = durations.astype(int)
+
+    if len(task_locations) == 0:
+        return 0
+
+    return max(task_bound(task_locations, durations, robots),
+               work_bound(durations, len(robots)),
+               *side_bounds(task_locations, durations, robots))
+
+
+# the relative optimality gap of the schedule length <length>, 0 if the lower bound is 0
+def optimality_gap(length, bound):
+
+    return (length - bound) / bound if bound > 0 else 0.0
+
+
+# the names of the result columns with the lower bound and the gaps of the algorithms <algos>
+def gap_columns(algos):
+
+    return ["lower_bound", *[f"{a}_gap" for a in algos]]
+
+
+# flattens the gaps dict filled in by run_algos into the gap columns values
+def gap_values(gaps):
+
+    return {"lower_bound": gaps["lower_bound"], **{f"{a}_gap": gap for a, gap in gaps.items() if a != "lower_bound"}}
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import numpy as np
+from generate_instances import UNIFORM_DISTR, UNEVEN_UNIFORM_DISTR, NORMAL_DISTR
+from sparse_graph import SparseGraph
+
+# the arrays of the store, each one is a raw file <name>.bin in the store directory read with np.memmap:
+# units (U, 4): n_vertices, n_tasks, dur, the first record of the unit, the records of a unit are consecutive
+# instances (I,): the first task of the instance in the tasks arrays, the tasks of an instance are consecutive
+# task_positions, task_durations (T,): the sorted task positions and their durations
+# records (R, 2): the instance and the first robot of the record in robot_positions
+# robot_positions (P,): the sorted robots positions
+STORE_ARRAYS = {"units": (np.int64, 4),
+                "instances": (np.int64, 1),
+                "task_positions": (np.int32, 1),
+                "task_durations": (np.int32, 1),
+                "records": (np.int64, 2),
+                "robot_positions": (np.int32, 1)}
+
+# the opened stores by the path, a store is opened once per process
+stores = {}
+
+
+# generates <size> sets of <n_positions> unique sorted positions on the path with <n_vertices> vertices at once,
+# the positions follow the distribution <distr>: uniform or, for any other value, a Gaussian around a random mean
+# as in generate_instances.generate_positions, the weighted sampling without replacement uses the exponential keys
+# u^(1/w) of Efraimidis and Spirakis, i.e. the positions with the largest log(u)/w are taken
+# returns the (size, n_positions) array
+def sample_positions(rng, n_vertices, n_positions, size, distr=UNIFORM_DISTR):
+
+    keys = np.log(rng.random((size, n_vertices)))
+
+    if distr != UNIFORM_DISTR:
+
+        mean = rng.integers(0, n_vertices + 1, size=size)[:, None]
+        xs = np.arange(0, n_vertices)[None, :]
+        std = n_vertices / 8
+        weights = np.exp(-0.5 * ((xs - mean) / std) ** 2)
+
+        with np.errstate(divide="ignore"):
+            keys = keys / weights
+
+    positions = np.argpartition(-keys, n_positions - 1, axis=1)[:, :n_positions] if n_positions < n_vertices \
+                else np.tile(np.arange(n_vertices), (size, 1))
+
+    return np.sort(positions, axis=1)
+
+
+# generates <size> sets of <num_tasks> task durations at once with the distributions of
+# generate_instances.generate_tasks_durations, returns the (size, num_tasks) array
+def sample_durations(rng, dur_param, num_tasks, size, distribution=UNIFORM_DISTR):
+
+    if distribution == UNIFORM_DISTR:
+        return rng.integers(1, dur_param + 1, size=(size, num_tasks))
+
+    if distribution == UNEVEN_UNIFORM_DISTR:
+
+        half = int(num_tasks / 2)
+        half_1 = rng.integers(1, int(dur_param / 2), size=(size, half))
+        half_2 = rng.integers(int(dur_param / 2), dur_param + 1, size=(size, num_tasks - half))
+        first = np.concatenate([half_1, half_2], axis=1)
+        second = np.concatenate([half_2, half_1], axis=1)
+
+        return np.where((rng.random(size) < 0.5)[:, None], first, second)
+
+    if distribution == NORMAL_DISTR:
+        tasks_durations = rng.normal(loc=dur_param, scale=dur_param / 3, size=(size, num_tasks)).astype(int)
+        return np.clip(tasks_durations, 1, dur_param * 3)
+
+    # EQUAL_DURATIONS
+    return np.full((size, num_tasks), dur_param)
+
+
+# generates all the instances of the <MODE 2> work unit (n_vertices, n_tasks, dur) in vectorized batches
+# the unit has <n_instances> instances, each of them with one robots placement for each of <robots_numbers>
+# returns the (n_instances, n_tasks) positions and durations and the list of the (n_instances, k) robots positions
+def generate_unit(rng, unit, n_instances, robots_numbers, config):
+
+    n_vertices, n_tasks, dur = unit
+
+    durations = sample_durations(rng, dur, n_tasks, n_instances, config.get("tasks_dur_distr", "equal"))
+    positions = sample_positions(rng, n_vertices, n_tasks, n_instances, config.get("tasks_pos_distr", "uniform"))
+    robots = [sample_positions(rng, n_vertices, k, n_instances, config.get("robots_distr", "uniform")) for k in robots_numbers]
+
+    return positions, durations, robots
+
+
+# generates the dataset of the <MODE 2> experiment described by <config> and writes it to the store directory <path>,
+# each work unit is generated from its own seed derived from <seed>, so the dataset depends only on the config and the seed
+def build_store(path, config, seed=0):
+
+    from run import experiment_units, unit_robots_numbers
+
+    os.makedirs(path, exist_ok=True)
+    files = {name: open(f"{path}/{name}.bin", "wb", buffering=1 << 20) for name in STORE_ARRAYS}
+    counts = {"instances": 0, "tasks": 0, "records": 0, "robots": 0}
+
+    n_instances = config.get("max_instances_num", 10)
+
+    for unit in experiment_units(config):
+
+        n_vertices, n_tasks, dur = unit
+        robots_numbers = unit_robots_numbers(config, n_vertices)
+        rng = np.random.default_rng(np.random.SeedSequence([seed, *unit]))
+
+        positions, durations, robots = generate_unit(rng, unit, n_instances, robots_numbers, config)
+
+        np.array([[n_vertices, n_tasks, dur, counts["records"]]], dtype=np.int64).tofile(files["units"])
+        (counts["tasks"] + n_tasks * np.arange(n_instances, dtype=np.int64)).tofile(files["instances"])
+        positions.astype(np.int32).tofile(files["task_positions"])
+        durations.astype(np.int32).tofile(files["task_durations"])
+
+        # the records are ordered by the instance and then by the number of robots as in run_unit
+        robots_per_instance = sum(robots_numbers)
+        if robots_per_instance > 0:
+            instance_robots = np.concatenate(robots, axis=1)
+            record_instances = np.repeat(counts["instances"] + np.arange(n_instances), len(robots_numbers))
+            record_starts = counts["robots"] + np.concatenate([[0], np.cumsum(np.tile(robots_numbers, n_instances))[:-1]])
+            np.stack([record_instances, record_starts], axis=1).astype(np.int64).tofile(files["records"])
+            instance_robots.astype(np.int32).tofile(files["robot_positions"])
+
+        counts["instances"] += n_instances
+        counts["tasks"] += n_instances * n_tasks
+        counts["records"] += n_instances * len(robots_numbers)
+        counts["robots"] += n_instances * robots_per_instance
+
+    for f in files.values():
+        f.close()
+
+    with open(f"{path}/meta.json", "w") as f:
+        json.dump({"seed": seed, "config": config, **counts}, f, indent=1)
+
+
+# the memory-mapped dataset written by build_store, the instances are read without any parsing
+class InstanceStore:
+
+    def __init__(self, path):
+
+        with open(f"{path}/meta.json", "r") as f:
+            self.meta = json.load(f)
+
+        self.path = path
+        self.arrays = {}
+        for name, (dtype, width) in STORE_ARRAYS.items():
+            if os.path.getsize(f"{path}/{name}.bin") == 0:
+                array = np.empty(0, dtype=dtype)
+            else:
+                array = np.memmap(f"{path}/{name}.bin", dtype=dtype, mode="r")
+            self.arrays[name] = array.reshape(-1, width) if width > 1 else array
+
+        self.unit_index = {unit: idx for idx, unit in enumerate(self.units())}
+
+    # the list of the work units (n_vertices, n_tasks, dur) of the dataset
+    def units(self):
+
+        return [tuple(int(v) for v in unit[:3]) for unit in self.arrays["units"]]
+
+    # the list of the (instance, robots) pairs of the work unit in the order of run_unit,
+    # an instance is the SparseGraph of the tasks on the path and robots is the list of the robots positions
+    def unit_instances(self, unit):
+
+        units, records = self.arrays["units"], self.arrays["records"]
+        instances, robot_positions = self.arrays["instances"], self.arrays["robot_positions"]
+
+        unit_idx = self.unit_index[tuple(unit)]
+        n_vertices, n_tasks, _, start = (int(v) for v in units[unit_idx])
+        end = int(units[unit_idx + 1, 3]) if unit_idx + 1 < len(units) else len(records)
+
+        robot_ends = np.append(records[start + 1:end, 1], records[end, 1] if end < len(records) else len(robot_positions))
+
+        result = []
+        for (instance_idx, robots_start), robots_end in zip(records[start:end].tolist(), robot_ends.tolist()):
+
+            tasks_start = int(instances[instance_idx])
+            instance = SparseGraph(n_vertices, self.arrays["task_positions"][tasks_start:tasks_start + n_tasks],
+                                   self.arrays["task_durations"][tasks_start:tasks_start + n_tasks])
+
+            result.append((instance, robot_positions[robots_start:robots_end].tolist()))
+
+        return result
+
+
+# returns the store at <path>, opened once per process
+def open_store(path):
+
+    if path not in stores:
+        stores[path] = InstanceStore(path)
+
+    return stores[path]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Generates the <MODE 2> dataset into a memory-mapped instance store')
+    parser.add_argument('--config', type=str, default="config.json",
+                        help='The config file of the experiment')
+    parser.add_argument("--output", type=str, required=True,
+                        help="The store directory")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="The dataset seed, the seed from the config file or 0 by default")
+
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    seed = args.seed if args.seed is not None else config.get("seed", 0)
+    build_store(args.output, config, seed=seed)
+
+    store = open_store(args.output)
+    print(f"{store.meta['instances']} instances with {store.meta['records']} robots placements in {len(store.units())} units "
+          f"written to {args.output}")
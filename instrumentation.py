@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# the counters of the algorithms are collected only if <enabled>, the algorithms check the flag before counting
+# so the disabled instrumentation costs one attribute lookup per counted event
+enabled = False
+counters = {}
+
+# the counters of each algorithm exported as the <a>_<counter> result columns, the phase timers are in nanoseconds
+# "restarts" of RA is the number of the Random_Attempt runs after the first one, of the single run and of the portfolio alike
+ALGORITHM_COUNTERS = {"p": ("C_1_calls", "dp_cells"),
+                      "i": ("skeleton_builds", "models", "build_ns", "solve_ns"),
+                      "g": ("collision_checks", "collision_rejections"),
+                      "r": ("collision_checks", "collision_rejections", "restarts"),
+                      "e": ("expanded_states", "generated_states", "dominated_states")}
+
+# the measurements of every instrumented algorithm run: the perf_counter_ns time and the tracemalloc peak memory
+RUN_COUNTERS = ("time_ns", "peak_memory")
+
+
+# adds <value> to the counter <name>
+def count(name, value=1):
+
+    counters[name] = counters.get(name, 0) + value
+
+
+# measures the time of the block with perf_counter_ns and adds it to the counter <name>_ns
+@contextmanager
+def phase(name):
+
+    if not enabled:
+        yield
+        return
+
+    start_time = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        count(f"{name}_ns", time.perf_counter_ns() - start_time)
+
+
+# the names of the result columns with the counters of the algorithms <algos>
+def counter_columns(algos):
+
+    return [f"{a}_{counter}" for a in algos for counter in (*RUN_COUNTERS, *ALGORITHM_COUNTERS[a])]
+
+
+# flattens the counters dict {a: {counter: value}} into the {<a>_<counter>: value} result columns values
+def counter_values(counters):
+
+    return {f"{a}_{counter}": value for a, values in counters.items() for counter, value in values.items()}
+
+
+# runs function(*args, **kwargs) with the counters enabled, with the peak memory traced if <memory>
+# returns the function result and the dict of the counters of the algorithm <a>, the missing counters are 0
+def measure(a, function, *args, memory=False, **kwargs):
+
+    global enabled
+
+    counters.clear()
+    enabled = True
+    if memory:
+        tracemalloc.start()
+
+    start_time = time.perf_counter_ns()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter_ns() - start_time
+        peak_memory = tracemalloc.get_traced_memory()[1] if memory else 0
+        if memory:
+            tracemalloc.stop()
+        enabled = False
+
+    stats = {counter: counters.get(counter, 0) for counter in ALGORITHM_COUNTERS[a]}
+    stats.update(time_ns=elapsed, peak_memory=peak_memory)
+
+    return result, stats
@@ -0,0 +1,199 @@
+import time
+import numpy as np
+from schedule import Schedule, robot_path
+from sparse_graph import graph_tasks
+from schedule_verifier import schedule_array, vertex_conflicts, swap_conflicts
+
+# the algorithms whose schedules are improved by the local search pass of run_algos
+LOCAL_SEARCH_ALGOS = "pgr"
+
+
+# the task visits of each robot in the order of its schedule, a visit is the pair (position, duration)
+# a task is assigned to the robot that completes it first, i.e. to the earliest stay at the task position
+# of at least duration + 1 timesteps (the arrival counts)
+# returns the list of the visits lists of the robots, None if some task is not completed by the schedule
+def schedule_visits(schedule, tasks):
+
+    durations = dict(tasks)
+    first_stay = {}
+
+    for r, s in enumerate(schedule):
+        run_start = 0
+        for t in range(1, len(s) + 1):
+            if t < len(s) and s[t] == s[run_start]:
+                continue
+            p = s[run_start]
+            if p in durations and t - run_start >= durations[p] + 1 and (p not in first_stay or run_start < first_stay[p][0]):
+                first_stay[p] = (run_start, r)
+            run_start = t
+
+    if len(first_stay) < len(durations):
+        return None
+
+    visits = [[] for _ in schedule]
+    for p, (_, r) in sorted(first_stay.items(), key=lambda x: x[1]):
+        visits[r].append((p, durations[p]))
+
+    return visits
+
+
+# the length of the compact schedule robot_path(start, visits) that goes straight from one visit to the next one
+# without any idle waits
+def visits_cost(start, visits):
+
+    positions = [start] + [p for p, _ in visits]
+
+    return int(np.sum(np.abs(np.diff(positions)))) + sum(d for _, d in visits)
+
+
+# the improving moves of the robot <c>, the new cost of every move is evaluated in O(1) from the costs of the compact schedules
+# - reversing the order of the visits i..j (2-opt, the adjacent swaps included), the deltas of all the pairs at once
+# - moving the leftmost (rightmost) task of the robot to the front or the end of the visits of the robot
+#   on its left (right) on the path
+# returns the list of (new cost of c, other robot, new cost of the other robot, new visits of c, new visits of the other robot),
+# other robot is None for the moves of c alone
+def robot_moves(c, neighbours, starts, visits, compact_costs, costs, makespan):
+
+    moves = []
+    own = visits[c]
+    m = len(own)
+
+    # the compact schedule without the idle waits
+    if compact_costs[c] < costs[c]:
+        moves.append((compact_costs[c], None, None, own, None))
+
+    if m >= 2:
+
+        ext = np.array([starts[c]] + [p for p, _ in own])
+        i, j = np.triu_indices(m, k=1)
+        i, j = i + 1, j + 1
+        after = np.minimum(j + 1, m)
+        has_after = j < m
+        deltas = np.abs(ext[i-1] - ext[j]) - np.abs(ext[i-1] - ext[i]) + \
+                 np.where(has_after, np.abs(ext[i] - ext[after]) - np.abs(ext[j] - ext[after]), 0)
+
+        for idx in np.nonzero(compact_costs[c] + deltas < costs[c])[0]:
+            a, b = i[idx] - 1, j[idx] - 1
+            moves.append((compact_costs[c] + int(deltas[idx]), None, None, own[:a] + own[a:b+1][::-1] + own[b+1:], None))
+
+    for other, pick in neighbours:
+
+        if other is None or m == 0:
+            continue
+
+        idx = pick(range(m), key=lambda v: own[v][0])
+        p, d = own[idx]
+        prev = own[idx-1][0] if idx > 0 else starts[c]
+        removal = (abs(prev - own[idx+1][0]) - abs(own[idx+1][0] - p) if idx + 1 < m else 0) - abs(prev - p) - d
+        new_cost = compact_costs[c] + removal
+        if new_cost >= costs[c]:
+            continue
+
+        rest = own[:idx] + own[idx+1:]
+        theirs = visits[other]
+        last = theirs[-1][0] if theirs else starts[other]
+        front = abs(starts[other] - p) + (abs(p - theirs[0][0]) - abs(starts[other] - theirs[0][0]) if theirs else 0) + d
+        end = abs(last - p) + d
+
+        for insertion, other_visits in ((front, [(p, d)] + theirs), (end, theirs + [(p, d)])):
+            if compact_costs[other] + insertion < makespan:
+                moves.append((new_cost, other, compact_costs[other] + insertion, rest, other_visits))
+
+    moves.sort(key=lambda move: (move[0], move[2] if move[2] is not None else -1))
+
+    return moves
+
+
+# improves the schedule on the path graph with the local search moves of robot_moves, a move is accepted if it shortens
+# the schedule of a robot with the longest schedule, keeps the other schedule shorter than the makespan
+# and the new schedules do not collide with the other ones. The changed robots get the compact schedules of their visits.
+# <graph> is the array of the tasks durations or the SparseGraph, <robots> is the list of the robots starting positions,
+# <schedule> is the Schedule (or the list of the robots schedules) in the order of <robots>
+# the search stops at a local optimum, after <max_iterations> collision checks or after <time_budget> seconds (no limit if None)
+# returns (length, Schedule), the original schedule if it cannot be improved
+def Local_Search(graph, robots, schedule, max_iterations=1000, time_budget=None):
+
+    start_time = time.time()
+
+    task_locations, durations = graph_tasks(graph)
+    tasks = list(zip(task_locations.tolist(), durations.astype(int).tolist()))
+    schedules = [[int(v) for v in s] for s in schedule]
+
+    visits = schedule_visits(schedules, tasks)
+    if visits is None:
+        return max(len(s) for s in schedules) - 1, schedule
+
+    k = len(schedules)
+    starts = [s[0] for s in schedules]
+    costs = [len(s) - 1 for s in schedules]
+    compact_costs = [visits_cost(starts[r], visits[r]) for r in range(k)]
+
+    # the neighbours of the robots on the path with the functions that pick the task to move to them
+    order = sorted(range(k), key=lambda r: starts[r])
+    left = {order[i]: order[i-1] for i in range(1, k)}
+    right = {order[i]: order[i+1] for i in range(k - 1)}
+
+    iterations = 0
+    improved = False
+
+    def budget_left():
+        return iterations < max_iterations and (time_budget is None or time.time() - start_time < time_budget)
+
+    while budget_left():
+
+        makespan = max(costs)
+        accepted = False
+
+        for c in [r for r in range(k) if costs[r] == makespan]:
+
+            neighbours = ((left.get(c), min), (right.get(c), max))
+            for new_cost, other, other_cost, own_visits, other_visits in robot_moves(c, neighbours, starts, visits,
+                                                                                      compact_costs, costs, makespan):
+
+                if not budget_left():
+                    break
+                iterations += 1
+
+                candidate = list(schedules)
+                candidate[c] = robot_path(starts[c], own_visits)
+                if other is not None:
+                    candidate[other] = robot_path(starts[other], other_visits)
+
+                # only the conflicts of the changed robots are new, the input schedule may have its own ones
+                positions = schedule_array(candidate)
+                changed = {c, other}
+                if any(conflict[-1] in changed or conflict[-2] in changed
+                       for conflict in vertex_conflicts(positions) + swap_conflicts(positions)):
+                    continue
+
+                schedules = candidate
+                for r, r_visits, r_cost in ((c, own_visits, new_cost), (other, other_visits, other_cost)):
+                    if r is not None:
+                        visits[r], costs[r], compact_costs[r] = r_visits, r_cost, r_cost
+                accepted = True
+                break
+
+            if accepted:
+                break
+
+        if not accepted:
+            break
+        improved = True
+
+    if not improved:
+        return max(costs), schedule
+
+    return max(costs), Schedule.from_robot_schedules(schedules)
+
+
+# the names of the result columns with the lengths before the local search and the local search times of the algorithms <algos>
+def search_columns(algos):
+
+    return [f"{a}_{column}" for a in algos if a in LOCAL_SEARCH_ALGOS for column in ("base_length", "search_time")]
+
+
+# flattens the searches dict filled in by run_algos into the search columns values
+def search_values(searches):
+
+    return {column: value for a, (base_length, search_time) in searches.items()
+            for column, value in ((f"{a}_base_length", base_length), (f"{a}_search_time", search_time))}
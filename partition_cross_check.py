@@ -0,0 +1,68 @@
+import argparse
+import random
+import numpy as np
+import Partition_Algorithm
+from generate_instances import generate_random_instance, generate_tasks_durations, generate_positions
+
+
+# runs the reference and the given Partition engines on the same random instance
+# returns None if the results are identical or the description of the mismatch otherwise
+def cross_check_instance(instance, robots, engine=Partition_Algorithm.BISECT_ENGINE):
+
+    ref_length, ref_schedule = Partition_Algorithm.Partition_Algorithm(instance, robots, engine=Partition_Algorithm.SCAN_ENGINE)
+    length, schedule = Partition_Algorithm.Partition_Algorithm(instance, robots, engine=engine)
+
+    if ref_length != length:
+        return f"length {length} != reference {ref_length}"
+
+    if ref_schedule != schedule:
+        return f"schedule {schedule} != reference {ref_schedule}"
+
+    return None
+
+
+# checks the engine against the reference implementation on <n_instances> random instances
+# returns the list of (instance, robots, mismatch) triples
+def cross_check(n_instances, max_vertices, seed=0, engine=Partition_Algorithm.BISECT_ENGINE):
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    mismatches = []
+    for _ in range(n_instances):
+
+        n_vertices = random.randint(3, max_vertices)
+        n_tasks = random.randint(1, n_vertices)
+        n_robots = random.randint(2, n_vertices - 1)
+
+        tasks_durations = generate_tasks_durations(random.randint(1, 10), n_tasks, random.choice(["uniform", "equal"]))
+        instance = generate_random_instance(n_vertices, tasks_durations, random.choice(["uniform", "normal"]))
+        robots = [int(r) for r in generate_positions(n_vertices, n_robots, random.choice(["uniform", "normal"]))]
+
+        mismatch = cross_check_instance(instance, robots, engine=engine)
+        if mismatch is not None:
+            mismatches.append((instance, robots, mismatch))
+
+    return mismatches
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Cross-check of the Partition engines against the reference scan')
+    parser.add_argument("--instances", type=int, default=1000,
+                        help="The number of random instances")
+    parser.add_argument("--max_vertices", type=int, default=30,
+                        help="The maximum number of vertices in a path")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The random seed")
+    parser.add_argument("--engine", type=str, default=Partition_Algorithm.BISECT_ENGINE,
+                        help="The Partition engine to check")
+
+    args = parser.parse_args()
+
+    mismatches = cross_check(args.instances, args.max_vertices, seed=args.seed, engine=args.engine)
+
+    for instance, robots, mismatch in mismatches:
+        print(f"Mismatch for instance {list(instance)} and robots {robots}: {mismatch}")
+
+    print(f"{len(mismatches)} mismatches in {args.instances} instances")
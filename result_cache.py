@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from result_writer import encode_schedule, decode_schedule
+
+# the source files the results of each algorithm depend on, the hash of their contents is the code version of the algorithm
+ALGORITHM_SOURCES = {"p": ("Partition_Algorithm.py",),
+                     "i": ("robot_scheduling_ILP.py",),
+                     "g": ("Greedy_Algorithm.py",),
+                     "r": ("Random_Algorithm.py", "Greedy_Algorithm.py"),
+                     "e": ("Exact_Algorithm.py", "Partition_Algorithm.py")}
+
+# the shared source files the results of all the algorithms depend on: the schedules, the sparse instances
+# and the lower bounds (the IP early stop and the exact search), they are a part of every code version
+SHARED_SOURCES = ("schedule.py", "sparse_graph.py", "bounds.py")
+
+# the code versions by the algorithm letter, computed once per process
+code_versions = {}
+
+# the opened caches by the path, a cache is opened once per process
+caches = {}
+
+# the limits of the cache are checked after every EVICT_INTERVAL stored results
+EVICT_INTERVAL = 100
+
+
+# the hash of the source files of the algorithm <a>, the cached results of the other code versions are never used
+def code_version(a):
+
+    if a not in code_versions:
+
+        digest = hashlib.sha256()
+        for source in (*ALGORITHM_SOURCES[a], *SHARED_SOURCES):
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source), "rb") as f:
+                digest.update(f.read())
+
+        code_versions[a] = digest.hexdigest()
+
+    return code_versions[a]
+
+
+# the cache key of the result of the algorithm <a> with the parameters <options> on the instance
+# <tasks> is the list of pairs (position, duration), the key is the hash of the canonical JSON of all of them
+def result_key(n_vertices, tasks, robots, a, options=None):
+
+    canonical = json.dumps({"n": int(n_vertices),
+                            "tasks": sorted([int(p), int(d)] for p, d in tasks),
+                            "robots": [int(r) for r in robots],
+                            "algo": a,
+                            "version": code_version(a),
+                            "options": options or {}}, sort_keys=True, default=str)
+
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# the local on-disk cache of the algorithms results in an SQLite database
+# the least recently used results are evicted when the cache has more than <max_entries> results
+# or more than <max_bytes> bytes of schedules (no limit if None), 
+# the limits are checked every EVICT_INTERVAL stored results and when the cache is closed
+class ResultCache:
+
+    def __init__(self, path, max_entries=None, max_bytes=None):
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.puts = 0
+
+        # the processes of the experiment share the database, the writers wait for each other
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, algo TEXT, version TEXT, "
+                                "length INTEGER, schedule BLOB, time REAL, size INTEGER, last_used REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+
+    # the cache key of the result, see result_key
+    def key(self, n_vertices, tasks, robots, a, options=None):
+
+        return result_key(n_vertices, tasks, robots, a, options)
+
+    def __contains__(self, key):
+
+        return self.connection.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone() is not None
+
+    # returns the cached (length, schedule, time) of the key or None
+    def get(self, key):
+
+        row = self.connection.execute("SELECT length, schedule, time FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        length, schedule, solve_time = row
+
+        return length, decode_schedule(np.frombuffer(schedule, dtype=np.int32)) if schedule is not None else None, solve_time
+
+    # stores the result of the algorithm <a> and evicts the least recently used results over the limits
+    def put(self, key, a, length, schedule, solve_time):
+
+        encoded = encode_schedule(schedule).tobytes() if schedule is not None else None
+        size = len(encoded) if encoded is not None else 0
+
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (key, a, code_version(a), int(length), encoded, float(solve_time), size, time.time()))
+
+        self.puts += 1
+        if self.puts % EVICT_INTERVAL == 0:
+            self.evict()
+
+    # removes the least recently used results until the cache is within its limits
+    def evict(self):
+
+        if self.max_entries is not None:
+            self.connection.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used DESC "
+                                    "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+        if self.max_bytes is not None:
+
+            total, = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+            if total > self.max_bytes:
+                # the running total of the sizes from the most recently used result, the results over the limit are removed
+                self.connection.execute("DELETE FROM results WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER "
+                                        "(ORDER BY last_used DESC ROWS UNBOUNDED PRECEDING) AS total FROM results) "
+                                        "WHERE total > ?)", (self.max_bytes,))
+
+    # removes the results of the algorithms <algos> (all the results if None),
+    # only the results of the older code versions if <stale_only>
+    # returns the number of the removed results
+    def invalidate(self, algos=None, stale_only=False):
+
+        removed = 0
+        for a in (algos if algos is not None else ALGORITHM_SOURCES):
+            condition, params = ("algo = ? AND version != ?", (a, code_version(a))) if stale_only else ("algo = ?", (a,))
+            removed += self.connection.execute(f"DELETE FROM results WHERE {condition}", params).rowcount
+
+        self.connection.execute("VACUUM")
+
+        return removed
+
+    # the number of the cached results and their schedules size in bytes by the algorithm
+    def stats(self):
+
+        return {a: (count, size) for a, count, size in
+                self.connection.execute("SELECT algo, COUNT(*), COALESCE(SUM(size), 0) FROM results GROUP BY algo")}
+
+    def close(self):
+
+        self.evict()
+        self.connection.close()
+
+
+# returns the cache at <path>, opened once per process
+def open_cache(path, max_entries=None, max_bytes=None):
+
+    if path not in caches:
+        caches[path] = ResultCache(path, max_entries=max_entries, max_bytes=max_bytes)
+
+    return caches[path]
+
+
+# closes all the caches opened by open_cache
+def close_caches():
+
+    for cache in caches.values():
+        cache.close()
+    caches.clear()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Inspects and invalidates the results cache')
+    parser.add_argument("--cache", type=str, required=True,
+                        help="The cache database")
+    parser.add_argument("--invalidate", action="store_true",
+                        help="Remove the cached results of --algos")
+    parser.add_argument("--stale", action="store_true",
+                        help="With --invalidate remove only the results of the older code versions")
+    parser.add_argument("--algos", type=str, default=None,
+                        help="The algorithms to invalidate, all by default")
+
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache)
+
+    if args.invalidate:
+        removed = cache.invalidate(list(args.algos) if args.algos is not None else None, stale_only=args.stale)
+        print(f"{removed} results removed")
+
+    for a, (count, size) in sorted(cache.stats().items()):
+        print(f"{a}: {count} results, {size / 2**20:.2f} MiB of schedules")
+
+    cache.close()
@@ -0,0 +1,225 @@
+import csv
+import os
+import numpy as np
+from schedule import Schedule
+
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+
+# the columns with the integer lists
+LIST_COLUMNS = ("tasks_positions", "tasks_durations", "robots")
+
+# the integer columns and the suffixes of the integer and the string columns of the algorithms,
+# the other columns (times, gaps and counters, the PA counters of a batch are fractional) are floats
+INTEGER_COLUMNS = ("n_vertices", "n_robots", "n_tasks", "dur", "lower_bound")
+INTEGER_SUFFIXES = ("_length", "_schedule_offset")
+STRING_SUFFIXES = ("_status",)
+
+
+# the columns of the results table for the algorithms <algos> and the additional columns <extra_columns>
+def result_columns(algos, extra_columns=()):
+
+    columns = ["n_vertices", "n_robots", "n_tasks", *extra_columns, "tasks_positions", "tasks_durations", "robots"]
+    for a in algos:
+        columns += [f"{a}_length", f"{a}_time", f"{a}_schedule_offset"]
+
+    return columns
+
+
+# the pyarrow type of the results table column
+def column_type(pa, column):
+
+    if column in LIST_COLUMNS:
+        return pa.list_(pa.int64())
+    if column in INTEGER_COLUMNS or column.endswith(INTEGER_SUFFIXES):
+        return pa.int64()
+    if column.endswith(STRING_SUFFIXES):
+        return pa.string()
+
+    return pa.float64()
+
+
+# the path of the file with the schedules of the results file <path>
+def schedules_path(path):
+
+    return f"{os.path.splitext(path)[0]}_schedules.bin"
+
+
+# encodes the schedule as one int32 array: the number of robots, the lengths of the robots schedules and all the vertices
+def encode_schedule(schedule):
+
+    if isinstance(schedule, Schedule):
+        k, T = schedule.positions.shape
+        return np.concatenate([np.array([k], dtype=np.int32), schedule.lengths,
+                               schedule.positions[np.arange(T)[None, :] < schedule.lengths[:, None]]])
+
+    lengths = [len(s) for s in schedule]
+    encoded = np.empty(1 + len(schedule) + sum(lengths), dtype=np.int32)
+    encoded[0] = len(schedule)
+    encoded[1:1 + len(schedule)] = lengths
+
+    position = 1 + len(schedule)
+    for s in schedule:
+        encoded[position:position + len(s)] = s
+        position += len(s)
+
+    return encoded
+
+
+# decodes the Schedule encoded by encode_schedule at <offset> (in int32 values) of the int32 array <encoded>
+def decode_schedule(encoded, offset=0):
+
+    k = int(encoded[offset])
+    lengths = encoded[offset + 1:offset + 1 + k]
+    ends = offset + 1 + k + np.cumsum(lengths)
+
+    return Schedule.from_robot_schedules(encoded[end - length:end] for length, end in zip(lengths, ends))
+
+
+# reads the schedule at <offset> (in int32 values) from the schedules file written by ResultWriter
+def read_schedule(path, offset):
+
+    return decode_schedule(np.memmap(path, dtype=np.int32, mode="r"), offset)
+
+
+# reads the results table written by ResultWriter into a pandas DataFrame
+def read_results(path):
+
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+
+    return pd.read_csv(path)
+
+
+# the header of the CSV results file at <path>, None if there is no such file or it is empty
+def csv_header(path):
+
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+
+    with open(path, "r", newline="") as table_file:
+        return next(csv.reader(table_file), None)
+
+
+# the long-lived buffered writer of the results
+# the numeric results are written to the CSV or Parquet table at <path>,
+# the schedules are appended to the binary file schedules_path(path) and the table keeps their offsets,
+# the rows are written in bulk when <buffer_rows> rows are collected or on flush()
+class ResultWriter:
+
+    def __init__(self, path, algos, output_format=CSV_FORMAT, extra_columns=(), buffer_rows=1000):
+
+        if output_format not in (CSV_FORMAT, PARQUET_FORMAT):
+            raise ValueError(f"Unknown output format {output_format}")
+
+        self.algos = algos
+        self.output_format = output_format
+        self.columns = result_columns(algos, extra_columns)
+        self.buffer_rows = buffer_rows
+        self.rows = []
+        self.schedules = []
+
+        if output_format == PARQUET_FORMAT:
+
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("The parquet output format requires pyarrow: pip install pyarrow")
+
+            # parquet files cannot be appended, so the results of a resumed run go to a new part
+            base, part = os.path.splitext(path)[0], 0
+            while os.path.exists(path):
+                part += 1
+                path = f"{base}_part{part}.parquet"
+
+            self.pa = pyarrow
+            self.table_writer = None
+            # the schema is fixed by the columns, so a batch with only None values in a column does not change it
+            self.schema = pyarrow.schema([(column, column_type(pyarrow, column)) for column in self.columns])
+
+        else:
+
+            # the rows are appended to the file with the same header, the results with other columns go to a new part
+            base, part = os.path.splitext(path)[0], 0
+            while csv_header(path) not in (None, self.columns):
+                part += 1
+                path = f"{base}_part{part}.csv"
+
+            new_file = csv_header(path) is None
+            self.table_file = open(path, "a", newline="", buffering=1 << 20)
+            self.csv_writer = csv.writer(self.table_file)
+            if new_file:
+                self.csv_writer.writerow(self.columns)
+
+        self.path = path
+        self.schedules_file = open(schedules_path(path), "ab", buffering=1 << 20)
+        self.schedules_offset = self.schedules_file.tell() // np.dtype(np.int32).itemsize
+
+    # adds the results of one instance, <tasks> is the list of pairs (position, duration),
+    # <s_lengths>, <times> and <schedules> are the dicts with the results of the algorithms
+    def add(self, n_vertices, tasks, robots, s_lengths, times, schedules, **extra):
+
+        row = {"n_vertices": int(n_vertices), "n_robots": len(robots), "n_tasks": len(tasks), **extra,
+               "tasks_positions": [int(t[0]) for t in tasks],
+               "tasks_durations": [int(t[1]) for t in tasks],
+               "robots": [int(r) for r in robots]}
+
+        for a in self.algos:
+
+            row[f"{a}_length"] = s_lengths[a]
+            row[f"{a}_time"] = times[a]
+            row[f"{a}_schedule_offset"] = -1
+
+            if schedules[a] is not None:
+                encoded = encode_schedule(schedules[a])
+                row[f"{a}_schedule_offset"] = self.schedules_offset
+                self.schedules_offset += len(encoded)
+                self.schedules.append(encoded)
+
+        self.rows.append(row)
+
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    # writes all the collected rows and schedules
+    def flush(self):
+
+        if self.schedules:
+            np.concatenate(self.schedules).tofile(self.schedules_file)
+            self.schedules = []
+        self.schedules_file.flush()
+
+        if self.rows and self.output_format == PARQUET_FORMAT:
+
+            table = self.pa.Table.from_pylist(self.rows, schema=self.schema)
+            if self.table_writer is None:
+                self.table_writer = self.pa.parquet.ParquetWriter(self.path, self.schema)
+            self.table_writer.write_table(table)
+
+        elif self.rows:
+
+            self.csv_writer.writerows([[" ".join(map(str, row[c])) if c in LIST_COLUMNS else row[c] for c in self.columns]
+                                       for row in self.rows])
+            self.table_file.flush()
+
+        self.rows = []
+
+    def close(self):
+
+        self.flush()
+        self.schedules_file.close()
+
+        if self.output_format == PARQUET_FORMAT:
+            if self.table_writer is not None:
+                self.table_writer.close()
+        else:
+            self.table_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,130 +1,286 @@
 import gurobipy  as gp
 from gurobipy import GRB
-from functools import *
-import ast
+from collections import OrderedDict
+import numpy as np
+import scipy.sparse as sp
+import time
+import sys
+import instrumentation
+from schedule import Schedule
+
+# the Gurobi environments by the license parameters, one environment is reused for all the models
+environments = {}
+
+# the model skeletons by the (environment, n, k, LIFETIME) shape, the least recently used skeletons are disposed
+skeletons = OrderedDict()
+MAX_SKELETONS = 8
+
+
+# returns the pooled Gurobi environment for the license parameters, the parameters with None values are skipped
+# so that the default (e.g. the size-limited pip) license is used if the config has no license
+# the environment is started without the output, so its license messages do not go to stdout,
+# the output of a solve is enabled by solve_model
+def get_environment(license):
+
+    options = {key: value for key, value in (license or {}).items() if value is not None}
+    key = tuple(sorted(options.items()))
+
+    if key not in environments:
+        environments[key] = gp.Env(params={"OutputFlag": 0, **options})
+
+    return environments[key]
+
+
+# adds the constraints A z <sense> rhs with the sparse matrix A given by its (rows, cols, vals) entries
+def add_sparse_constraints(model, z, rows, cols, vals, sense, rhs, name):
+
+    A = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(len(rhs), z.shape[0]))
+
+    return model.addMConstr(A, z, sense, rhs, name=name)
+
+
+# builds the instance-independent scheduling model for n vertices, k robots and LIFETIME timesteps with the matrix API,
+# all the variables are one MVar z and every family of constraints is one sparse coefficient matrix
+# the instance enters the model only through the bounds and the right-hand sides set by set_instance:
+# the starting positions are the lower bounds of x at t=0, the tasks are the right-hand sides LIFETIME + 1 - duration
+# of the per-vertex completion constraints (the duration is 0 for the vertices without tasks)
+# returns the dict with the model, its variables and the instance-dependent constraints
+def build_skeleton(env, n, k, LIFETIME):
+
+    L = LIFETIME
+    model = gp.Model("RobotScheduling", env=env)
+    # the skeleton is quiet until solve_model enables the output of a solve, so its parameter changes and resets print nothing
+    model.setParam('OutputFlag', 0)
+
+    # the indices of the variables in z
+    x = np.arange(k * n * L).reshape(k, n, L) # x[r,v,t] = true if robot r at vertex v at the end of timestep t
+    mo = x + k * n * L # mo[r,v,t] = 1 if robot r just moved to vertex v during timestep t
+    stay = 2 * k * n * L + np.arange(n * L).reshape(n, L) # stay[v,t] = the number of timesteps a robot stays at v without moving
+    TC = stay + n * L # TC[v,t] = the task at vertex v complete at timestep t
+    AC = 2 * k * n * L + 2 * n * L + np.arange(L) #ALL_COMPLETE at time t
+    TS = AC[-1] + 1 #ALL_COMPLETE but this time its an integer
+
+    vtypes = np.array([GRB.BINARY] * (k * n * L) + [GRB.CONTINUOUS] * (k * n * L + n * L) + [GRB.BINARY] * (n * L + L) + [GRB.INTEGER])
+    ub = np.concatenate([np.ones(2 * k * n * L), np.full(n * L, GRB.INFINITY), np.ones(n * L + L), [GRB.INFINITY]])
+    z = model.addMVar(TS + 1, lb=0, ub=ub, vtype=vtypes, name="z")
+
+    ones = lambda a: np.ones(a.size)
+
+    # each robot is at one vertex and each vertex has at most one robot at each timestep
+    rows = np.arange(k * L).reshape(k, L)
+    add_sparse_constraints(model, z, [rows.ravel()] * n, [x[:, v, :].ravel() for v in range(n)], [np.ones(k * L)] * n,
+                           GRB.EQUAL, np.ones(k * L), "only_one_place")
+    rows = np.arange(n * L).reshape(n, L)
+    add_sparse_constraints(model, z, [rows.ravel()] * k, [x[r].ravel() for r in range(k)], [np.ones(n * L)] * k,
+                           GRB.LESS_EQUAL, np.ones(n * L), "collision_free")
+
+    # We removed the constraints on traversing to accelerate the algorith, the traversing check and fix afterwards is advised
+    # (see schedule_verifier.swap_conflicts)
+    # adjacency: x[r,v,t] <= x[r,v-1,t-1] + x[r,v,t-1] + x[r,v+1,t-1]
+    rows = np.arange(k * n * (L - 1)).reshape(k, n, L - 1)
+    add_sparse_constraints(model, z, 
+                           [rows.ravel(), rows.ravel(), rows[:, 1:].ravel(), rows[:, :-1].ravel()],
+                           [x[:, :, 1:].ravel(), x[:, :, :-1].ravel(), x[:, :-1, :-1].ravel(), x[:, 1:, :-1].ravel()],
+                           [ones(rows), -ones(rows), -ones(rows[:, 1:]), -ones(rows[:, :-1])],
+                           GRB.LESS_EQUAL, np.zeros(rows.size), "adjacency")
+
+    # the linearization of mo[r,v,t] = x[r,v,t] * (1 - x[r,v,t-1]): with the adjacency constraints it is 1 exactly
+    # when the robot moved to v from a neighbour, the robots just "arrive" at their starting positions at t=0
+    rows = np.arange(k * n * L).reshape(k, n, L)
+    add_sparse_constraints(model, z, [rows.ravel(), rows.ravel()], [mo.ravel(), x.ravel()], [ones(rows), -ones(rows)],
+                           GRB.LESS_EQUAL, np.zeros(rows.size), "just_moved_x")
+    add_sparse_constraints(model, z, [rows.ravel(), rows.ravel(), rows[:, :, 1:].ravel()], 
+                           [mo.ravel(), x.ravel(), x[:, :, :-1].ravel()],
+                           [ones(rows), -ones(rows), ones(rows[:, :, 1:])],
+                           GRB.GREATER_EQUAL, np.zeros(rows.size), "just_moved")
+
+    # the robot at v stays there without moving: x - mo is 1, the counter grows by one, otherwise it is reset to 0
+    rows = np.arange(n * (L - 1)).reshape(n, L - 1)
+    add_sparse_constraints(model, z, [rows.ravel(), rows.ravel()], [stay[:, 1:].ravel(), stay[:, :-1].ravel()],
+                           [ones(rows), -ones(rows)], GRB.LESS_EQUAL, np.ones(rows.size), "stay_count")
+    rows = np.arange(n * L).reshape(n, L)
+    add_sparse_constraints(model, z, [rows.ravel()] + [rows.ravel()] * (2 * k), 
+                           [stay.ravel()] + [x[r].ravel() for r in range(k)] + [mo[r].ravel() for r in range(k)],
+                           [ones(rows)] + [np.full(rows.size, -L)] * k + [np.full(rows.size, L)] * k,
+                           GRB.LESS_EQUAL, np.zeros(rows.size), "stay_reset")
+
+    # the task of duration d at v completes at t if a robot stayed at v for d timesteps before t:
+    # (LIFETIME + 1) * (TC[v,t] - TC[v,t-1]) - stay[v,t-1] <= LIFETIME + 1 - d, binding only when TC jumps to 1
+    rows = np.arange(n * (L - 1)).reshape(n, L - 1)
+    completion = add_sparse_constraints(model, z, [rows.ravel()] * 3, 
+                                        [TC[:, 1:].ravel(), TC[:, :-1].ravel(), stay[:, :-1].ravel()],
+                                        [np.full(rows.size, L + 1), np.full(rows.size, -(L + 1)), -ones(rows)],
+                                        GRB.LESS_EQUAL, np.zeros(rows.size), "task_complete")
+    initial_completion = add_sparse_constraints(model, z, [np.arange(n)], [TC[:, 0]], [np.ones(n)],
+                                                GRB.LESS_EQUAL, np.ones(n), "task_complete_initial")
+    add_sparse_constraints(model, z, [rows.ravel()] * 2, [TC[:, 1:].ravel(), TC[:, :-1].ravel()], [ones(rows), -ones(rows)],
+                           GRB.GREATER_EQUAL, np.zeros(rows.size), "TC_stays_complete")
+
+    rows = np.arange(n * L).reshape(n, L)
+    all_complete = add_sparse_constraints(model, z, [rows.ravel()] * 2, [np.broadcast_to(AC, (n, L)).ravel(), TC.ravel()],
+                                          [ones(rows), -ones(rows)], GRB.LESS_EQUAL, np.ones(rows.size), "All_tasks_Complete?")
+    add_sparse_constraints(model, z, [np.zeros(L, dtype=int)], [AC], [np.ones(L)], GRB.EQUAL, np.ones(1), "one_complete_time")
+    add_sparse_constraints(model, z, [np.zeros(L, dtype=int)], [np.append(AC[1:], TS)], [np.append(np.arange(1, L), -1)],
+                           GRB.EQUAL, np.zeros(1), "TS")
+
+    return {"model": model, "z": z, "x": z[:k * n * L], "shape": (k, n, L), "TS": z[TS].item(), 
+            "completion": completion, "initial_completion": initial_completion, "all_complete": all_complete}
+
+
+# returns the cached skeleton for the shape or builds a new one
+def get_skeleton(env, n, k, LIFETIME):
+
+    key = (id(env), n, k, LIFETIME)
+
+    if key in skeletons:
+        skeletons.move_to_end(key)
+        return skeletons[key]
+
+    if instrumentation.enabled:
+        instrumentation.count("skeleton_builds")
+
+    skeletons[key] = build_skeleton(env, n, k, LIFETIME)
+    if len(skeletons) > MAX_SKELETONS:
+        _, evicted = skeletons.popitem(last=False)
+        evicted["model"].dispose()
+
+    return skeletons[key]
+
+
+# sets the instance (tasks and starting positions of the robots) to the skeleton via the bounds and the right-hand sides
+# if feasibility==True the model has no objective, i.e. any schedule found within LIFETIME is accepted
+# <lower_bound> is a known lower bound of the schedule length (see bounds.py), it bounds the objective from below
+# and the search stops as soon as a schedule of that length is found
+def set_instance(skeleton, n, tasks, robots, feasibility=False, lower_bound=None):
+
+    model, x, TS = skeleton["model"], skeleton["x"], skeleton["TS"]
+    k, _, LIFETIME = skeleton["shape"]
+
+    # the output may be left enabled by the previous solve on the skeleton
+    model.setParam('OutputFlag', 0)
+
+    durations = np.zeros(n)
+    for position, duration in tasks:
+        durations[int(position)] = duration
+    has_task = (durations > 0).astype(float)
+
+    lb = np.zeros(skeleton["shape"])
+    lb[np.arange(k), np.asarray(robots, dtype=int), 0] = 1
+    x.LB = lb.ravel()
+
+    skeleton["completion"].RHS = np.repeat(LIFETIME + 1 - durations, LIFETIME - 1)
+    skeleton["initial_completion"].RHS = 1 - has_task
+    skeleton["all_complete"].RHS = np.repeat(1 - has_task, LIFETIME)
+
+    TS.LB = 0 if lower_bound is None else lower_bound + 1
+    model.setParam('BestObjStop', -GRB.INFINITY if lower_bound is None else lower_bound)
+
+    if feasibility:
+        model.setObjective(gp.LinExpr(), GRB.MINIMIZE)
+        model.setParam('SolutionLimit', 1)
+    else:
+        model.setObjective(TS - 1, GRB.MINIMIZE)
+        model.setParam('SolutionLimit', GRB.MAXINT)
+
+    x.Start = np.full(x.shape[0], GRB.UNDEFINED)
+    model.reset(0)
+
+
+# sets the schedule (a Schedule or a list of per-robot lists of vertices) as the MIP start of the model,
+# the robots stay at their last vertices after the end of their schedules
+def set_start(skeleton, schedule):
+
+    x = skeleton["x"]
+    k, n, LIFETIME = skeleton["shape"]
+
+    positions = np.empty((k, LIFETIME), dtype=int)
+    for r, robot_schedule in enumerate(schedule):
+        positions[r, :min(len(robot_schedule), LIFETIME)] = robot_schedule[:LIFETIME]
+        positions[r, len(robot_schedule):] = robot_schedule[-1]
+
+    start = np.zeros(skeleton["shape"])
+    start[np.arange(k)[:, None], positions, np.arange(LIFETIME)[None, :]] = 1
+    x.Start = start.ravel()
+
+
+# reads the Schedule of the solved model: the vertex of each robot at each timestep until all the tasks are complete
+def extract_schedule(x, shape, TS):
+
+    return Schedule(x.X.reshape(shape).argmax(axis=1)[:, :int(round(TS.X))])
+
+
+# solves the instance with LIFETIME timesteps on the cached model skeleton within <time_limit> seconds (no limit if None),
+# returns the (length, schedule) pair or None if there is no schedule within LIFETIME (or none is found in time)
+def solve_model(env, n, tasks, robots, LIFETIME, initial_schedule=None, feasibility=False, verbose=0, lower_bound=None,
+                time_limit=None):
+
+    with instrumentation.phase("build"):
+
+        skeleton = get_skeleton(env, n, len(robots), LIFETIME)
+        model, x, TS = skeleton["model"], skeleton["x"], skeleton["TS"]
+
+        set_instance(skeleton, n, tasks, robots, feasibility=feasibility, lower_bound=lower_bound)
+        model.setParam('TimeLimit', GRB.INFINITY if time_limit is None else max(time_limit, 0))
+
+        if initial_schedule is not None and max(len(s) for s in initial_schedule) + 1 <= LIFETIME:
+            set_start(skeleton, initial_schedule)
+
+        model.setParam('OutputFlag', verbose)
+
+    if instrumentation.enabled:
+        instrumentation.count("models")
+
+    with instrumentation.phase("solve"):
+        model.optimize()
+
+    if model.SolCount == 0:
+        if model.Status != GRB.INFEASIBLE:
+            print(f"No solution found with status {model.Status} for n: {n}, tasks: {tasks}, robots: {robots}, LIFETIME: {LIFETIME}", file=sys.stderr)
+        return None
+
+    return int(round(TS.X)) - 1, extract_schedule(x, skeleton["shape"], TS)
+
 
 # n is the number of vertices
 # tasks is the list of pairs (position, duration)
 # sv is the list of starting positions of robots
-def Optimize_Robot_Scheduling(n, tasks, robots, license, max_time=None, verbose=0):
-    
-    k = len(robots)
-    m = len(tasks)
+# initial_schedule is a known schedule (e.g. of PA), it is used as the MIP start
+# if tighten==True and initial_schedule is given, instead of one model with max_time timesteps
+# the feasibility models with decreasing horizons are solved: each of them searches for a schedule shorter
+# than the best known one, the last known schedule is optimal when the model is infeasible
+# lower_bound is a known lower bound of the schedule length (see bounds.py), the search stops when it is reached
+# time_limit is the wall-clock limit in seconds of the whole search (no limit if None), the best schedule found
+# by then is returned
+def Optimize_Robot_Scheduling(n, tasks, robots, license, max_time=None, verbose=0, initial_schedule=None, tighten=False,
+                              lower_bound=None, time_limit=None):
+
+    deadline = None if time_limit is None else time.time() + time_limit
+
     # if the max lifetime is predicted by other methods we can use it to accelerate scheduling
     LIFETIME = n + min(robots[0], n - 1 - robots[-1]) + sum([t[1] for t in tasks]) if max_time == None else max_time
+    LIFETIME = int(LIFETIME)
 
-    # Create a new model
-    options = license
-    env = gp.Env(params=options)
-    model = gp.Model("RobotScheduling", env=env)
-    # Create variables
-    x = model.addVars(k, n, LIFETIME, vtype=GRB.BINARY, name="x") # x[r,v,t] = true if robot i at vertex v at the end of timestep t
-    mo = model.addVars(k, n, LIFETIME, vtype=GRB.BINARY, name="mo") # mo[r,v,t] = 1 if robot r just moved to vertex v during timestep t
-    TCR = model.addVars(k, len(tasks), LIFETIME, vtype=GRB.BINARY, name="TCR") #TCR[r,i,t] = task i complete by robot r at time t
-    TC = model.addVars(len(tasks), LIFETIME, vtype=GRB.BINARY, name="TC") # TC[i,t] = task i complete at timestep t
-    AC = model.addVars(LIFETIME, vtype=GRB.BINARY, name="AC") #ALL_COMPLETE at time t
-    TS = model.addVar(vtype=GRB.INTEGER, name="TS") #ALL_COMPLETE but this time its an integer
-
-    for i in range(k):
-        model.addConstr(x[i, robots[i], 0] == 1, name="initialise x sv_r")
-        model.addConstr(mo[i, robots[i], 0] == 1, name="initialise mo sv_r")
-    
-    for r in range(k):
-        for i in range(m):
-            for t in range(tasks[i][1]):
-                model.addConstr(TCR[r, i, t] == 0, name="TCR_Initial_Values") #there's no way a task can be completed before its duration
-    
-    for r in range(k):
-        model.addConstrs((TCR[r, i, t] <= TCR[r, i, t-1] + (gp.quicksum((1 - mo[r, tasks[i][0], j]) * x[r, tasks[i][0], j] 
-                                                                for j in range(t - tasks[i][1], t))/(tasks[i][1])) 
-                                                                for i in range(m) for t in range(tasks[i][1], LIFETIME)),
-                                                                name=f"task_complete_R{r}")    
-    
-    model.addConstrs((TC[i, t] >= TC[i, t-1] for i in range(m) for t in range(1, LIFETIME)), name="TC_stays_complete")
-    model.addConstrs((TCR[r, i, t] >= TCR[r, i, t-1] for r in range(k) for i in range(m) for t in range(1, LIFETIME)),
-                 name="TCR_stays_complete")
-    
-    model.addConstrs((TC[i, t] == gp.quicksum(TCR[r, i, t]  for r in range(k)) for i in range(m) for t in range(LIFETIME)),
-                 name="TC iff TCR")
-    
-    for r in range(k):
-        model.addConstrs((gp.quicksum(x[r, v, t] for v in range(n)) == 1 for t in range(LIFETIME)), name=f"R_{r} only_one_place")
-        model.addConstrs((gp.quicksum(mo[r, v, t] for v in range(n)) <= 1 for t in range(LIFETIME)))
-        
-    model.addConstrs((mo[r, v, t] == gp.quicksum(x[r, v_prime, t-1] * x[r, v, t] for v_prime in [v-1, v+1]) \
-                  for r in range(k) \
-                  for v in range(1, n-1) \
-                  for t in range(1, LIFETIME)),
-                  name="just_moved")
-    
-    model.addConstrs((mo[r, 0, t] == x[r, 1, t-1] * x[r, 0, t] 
-                  for r in range(k) 
-                  for t in range(1, LIFETIME)), 
-                  name="just_moved")
-    
-    model.addConstrs((mo[r, n-1, t] == x[r, n-2, t-1] * x[r, n-1, t] 
-                  for r in range(k) 
-                  for t in range(1, LIFETIME)), 
-                  name="just_moved")
-    
-    model.addConstrs((gp.quicksum(x[r, v, t] 
-                              for r in range(k)) <= 1 
-                              for v in range(n) 
-                              for t in range(LIFETIME)), 
-                              name="collision_free")
-    
-    # We removed the constraints on traversing to accelerate the algorith, the traversing check and fix afterwards is advised
-    # m.addConstrs(x[r,v,t] + x[r,v+1,t+1] + x[r_prime,v+1,t]+x[r_prime,v,t+1] <= 3 for (r,r_prime) in itertools.combinations(range(len(sv)), 2) for v in range(n-1) for t in range(LIFETIME-1))
-    # m.addConstrs(x[r_prime,v,t] + x[r_prime,v+1,t+1] + x[r,v+1,t]+x[r,v,t+1] <= 3 for (r,r_prime) in itertools.combinations(range(len(sv)), 2) for v in range(n-1) for t in range(LIFETIME-1))
-    
-    model.addConstrs((x[r, v, t] <= (x[r, v-1, t-1] + x[r, v, t-1] + x[r, v+1, t-1]) 
-                  for v in range(1, n-1) 
-                  for t in range(1, LIFETIME) 
-                  for r in range(k)), 
-                  name="Adjacency") #Adjacency conditions
-    
-    model.addConstrs((x[r, 0, t] <= (x[r, 0, t-1] + x[r, 1, t-1]) 
-                  for t in range(1, LIFETIME) 
-                  for r in range(k)), 
-                  name="adjacency_first")
-    
-    model.addConstrs((x[r, n-1, t] <= (x[r, n-2, t-1] + x[r, n-1, t-1]) 
-                  for t in range(1, LIFETIME) 
-                  for r in range(k)), 
-                  name="adjacency_last")
-    
-    model.addConstrs((AC[t] <= gp.quicksum(TC[i, t] 
-                                       for i in range(m)) / m 
-                                       for t in range(LIFETIME)), 
-                                       name="All_tasks_Complete?")
-    
-    model.addConstr(gp.quicksum(AC[t] for t in range(LIFETIME)) == 1)
-    model.addConstr(TS == gp.quicksum(t*(AC[t]) for t in range(LIFETIME)))
-    
-    model.setObjective(TS - 1, GRB.MINIMIZE)
-        
-    model.setParam('OutputFlag', verbose)
-    model.optimize()
-
-    if verbose:
-
-        try:
-            schedule = "["
-            for r in range(k):
-                schedule += "["
-                for t in range(int(TS.X)):
-                    for v in range(n):
-                        if x[r, v, t].X == 1:
-                            schedule+=f"{v}, "
-                
-                schedule = schedule[:-2] + "], "
-            schedule = schedule[:-2] + "]"
-        
-        except AttributeError as e:
-            print("No solution found. Error:", e)
-            print("Input parameters:")
-            print(f"n: {n}, tasks: {tasks}, robots: {robots}, max_time: {max_time}, verbose: {verbose}")
-
-        schedule = ast.literal_eval(schedule)
-
-    return(int(TS.X - 1), schedule)
+    env = get_environment(license)
+
+    if not tighten or initial_schedule is None:
+
+        result = solve_model(env, n, tasks, robots, LIFETIME, initial_schedule=initial_schedule, verbose=verbose,
+                             lower_bound=lower_bound, time_limit=time_limit)
+        if result is None:
+            raise RuntimeError(f"No schedule found for n: {n}, tasks: {tasks}, robots: {robots}, max_time: {max_time}")
+
+        return result
+
+    best = (max(len(s) for s in initial_schedule) - 1, initial_schedule)
+
+    while best[0] > (lower_bound or 0) and (deadline is None or time.time() < deadline):
+
+        # a schedule of length L needs L + 2 timesteps, so L + 1 timesteps allow only the shorter schedules
+        result = solve_model(env, n, tasks, robots, best[0] + 1, feasibility=True, verbose=verbose, lower_bound=lower_bound,
+                             time_limit=None if deadline is None else deadline - time.time())
+        if result is None:
+            break
+
+        best = result
+
+    return best
@@ -1,90 +1,551 @@
 from pathlib import Path
 import numpy as np
 import time
-import Partition_Algorithm
-import Greedy_Algorithm
-import Random_Algorithm
-import robot_scheduling_ILP
+import random
+import importlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 import argparse
-from collections import Counter
 import os
 import json
-import pandas as pd
-import ast
+import hashlib
+import instrumentation
+import bounds
+from schedule_verifier import verify_schedule
+from sparse_graph import SparseGraph, graph_tasks
+from local_search import Local_Search, LOCAL_SEARCH_ALGOS, search_columns, search_values
+from solver_pool import SolverPool, OK_STATUS, TIMEOUT_STATUS, CAPPED_STATUS, status_columns, status_values
+from result_writer import ResultWriter, CSV_FORMAT
 from generate_instances import generate_random_instance, generate_tasks_durations, generate_positions
 
-def collision_free_check(schedule):
 
-    # Find maximum length
-    max_len = max(len(lst) for lst in schedule)
+# the loaders of the scheduling algorithms modules by the algorithm letter,
+# a module (and its dependencies, e.g. gurobipy for the IP) is imported only when its algorithm is used
+ALGORITHM_LOADERS = {"p": partial(importlib.import_module, "Partition_Algorithm"),
+                     "i": partial(importlib.import_module, "robot_scheduling_ILP"),
+                     "g": partial(importlib.import_module, "Greedy_Algorithm"),
+                     "r": partial(importlib.import_module, "Random_Algorithm"),
+                     "e": partial(importlib.import_module, "Exact_Algorithm")}
 
-    # Pad each list with its last element
-    padded = [
-        lst + [lst[-1]] * (max_len - len(lst)) if lst else []  # handles empty lists
-        for lst in schedule
-    ]
 
-    duplicates = [
-    (idx, col) for idx, col in enumerate(zip(*padded))
-    if any(count > 1 for count in Counter(map(int, col)).values())
-    ]
+def load_algorithm(a):
+
+    if a not in ALGORITHM_LOADERS:
+        raise AssertionError(f"Unknown scheduling algorithm {a}")
+
+    return ALGORITHM_LOADERS[a]()
 
-    if len(duplicates) > 0:
-        
-        print(f"Collisions at timesteps: {duplicates}")
-        for idx, col in enumerate(zip(*padded)):
-            print(Counter(map(int, col)).values())
 
-        for s in schedule:
-            print(s)
+# the heuristic algorithms, they do not depend on the results of the other algorithms and can run concurrently
+HEURISTIC_ALGOS = "pgr"
 
-    return len(duplicates) == 0
 
+# the run options of run_algos with their defaults, see run_algos
+RUN_OPTIONS = {"counters": None, "trace_memory": False, "cache": None, "IP_skip_optimal": True, "gaps": None,
+               "local_search": None, "searches": None, "time_budgets": None, "instance_budget": None, "statuses": None,
+               "IP_verbose": 1}
 
-def run_algos(algos, instance, robots, IP_licence=None):
 
-    task_locations = list(np.nonzero(instance)[0])
-    tasks = [(task, int(instance[task])) for task in task_locations]
+# solves the Partition_Algorithm for all the (instance, robots) pairs, grouping the pairs of the same shape into batches,
+# an instance is the dense or the sparse graph
+# returns the list of (length, schedule, time, counters) tuples in the order of the pairs, 
+# the time of a batch is divided equally between its instances, and so are the counters if <instrument> (None otherwise),
+# the peak memory of an instance is the peak memory of its batch
+def run_partition_batches(instances, robots_list, instrument=False, trace_memory=False):
 
-    def run_algorithm(a, max_length):
+    groups = {}
+    for idx, (instance, robots) in enumerate(zip(instances, robots_list)):
+        shape = (len(instance), len(graph_tasks(instance)[0]), len(robots))
+        groups.setdefault(shape, []).append(idx)
 
-        if a == "p":
-            return Partition_Algorithm.Partition_Algorithm(instance, robots)
-        elif a == "i":
-            return robot_scheduling_ILP.Optimize_Robot_Scheduling(len(instance), 
-                                                                    tasks, 
-                                                                    robots,
-                                                                    license=IP_licence,
-                                                                    max_time=max_length + 2,
-                                                                    verbose=1)
-        elif a == "g":
-            return Greedy_Algorithm.Greedy_Algorithm(instance, robots)
-        elif a == "r":
-            return Random_Algorithm.Random_Algorithm(instance, robots)
+    results = [None] * len(instances)
+    for indices in groups.values():
+
+        batch = ([instances[i] for i in indices], np.array([robots_list[i] for i in indices]))
+        counters = None
+
+        start_time = time.time()
+        if instrument:
+            (lengths, schedules), counters = instrumentation.measure("p", load_algorithm("p").Partition_Algorithm_Batch, *batch,
+                                                                      return_schedules=True, memory=trace_memory)
+            counters = {key: value if key == "peak_memory" else value / len(indices) for key, value in counters.items()}
         else:
-            raise AssertionError(f"Unknown scheduling algorithm {a}")
+            lengths, schedules = load_algorithm("p").Partition_Algorithm_Batch(*batch, return_schedules=True)
+        batch_time = (time.time() - start_time) / len(indices)
+
+        for i, length, schedule in zip(indices, lengths, schedules):
+            results[i] = (int(length), schedule, batch_time, counters)
+
+    return results
+
+
+# runs the heuristic algorithm <a> (PA, GA or RA) of the loaded <module> on the instance, returns the (length, schedule) pair
+# <random_portfolio> is the dict with the Random_Portfolio parameters (restarts, seed, processes, time_budget),
+# a single Random_Algorithm run is used if None
+def run_heuristic(a, module, instance, robots, partition_engine="scan", random_portfolio=None):
+
+    if a == "p":
+        return module.Partition_Algorithm(instance, robots, engine=partition_engine)
+    elif a == "g":
+        return module.Greedy_Algorithm(instance, robots)
+    else:
+        if random_portfolio is not None:
+            length, schedule, _ = module.Random_Portfolio(instance, robots, **random_portfolio)
+            return length, schedule
+        return module.Random_Algorithm(instance, robots)
+
+
+# runs the heuristic algorithm <a> in a solver process of solver_pool.SolverPool
+# returns (length, schedule, time, counters), counters is None unless <instrument>
+def solve_heuristic(a, instance, robots, partition_engine="scan", random_portfolio=None, instrument=False, trace_memory=False):
+
+    # the module is loaded before the timer starts, so the first run of the algorithm does not pay for the import
+    module = load_algorithm(a)
+    start_time = time.time()
+
+    if instrument:
+        (length, schedule), counters = instrumentation.measure(a, run_heuristic, a, module, instance, robots, partition_engine,
+                                                               random_portfolio, memory=trace_memory)
+    else:
+        (length, schedule), counters = run_heuristic(a, module, instance, robots, partition_engine, random_portfolio), None
+
+    return length, schedule, time.time() - start_time, counters
+
+
+# <partition_result> is the (length, schedule, time, counters) tuple if the Partition_Algorithm is already solved for the instance
+# <random_portfolio> is the dict with the Random_Portfolio parameters, see run_heuristic
+# the IP gets the shortest schedule found before it as the MIP start, with <IP_tighten> it searches for shorter schedules
+# at decreasing horizons instead of solving one large model
+# the exact search (see Exact_Algorithm.py) runs after PA and searches only for the schedules shorter than the shortest
+# schedule found before it, it stops at its budget or at Exact_Algorithm.TIME_LIMIT without the budget
+# and is not started for more than Exact_Algorithm.MAX_ROBOTS robots
+# <options> is the dict of the run options below, the missing ones have the defaults of RUN_OPTIONS:
+# if <counters> is a dict, the algorithms are instrumented and counters[a] is set to the dict of the counters of the algorithm a
+# (see instrumentation.ALGORITHM_COUNTERS), with the tracemalloc peak memory if <trace_memory>
+# <cache> is the result_cache.ResultCache, the cached results are reported instead of solving the instance again
+# the lower bound of the schedule length (see bounds.py) stops the IP as soon as it is reached, with <IP_skip_optimal>
+# the IP is not solved at all if PA already reaches it, and the schedule of PA is reported for the IP
+# if <gaps> is a dict, gaps[a] is set to the optimality gap of the algorithm a and gaps["lower_bound"] to the lower bound
+# <local_search> is the dict with the Local_Search parameters (max_iterations, time_budget), the schedules of PA, GA and RA
+# are improved by the local search before the next algorithms if given, the reported times do not include it
+# if <searches> is a dict, searches[a] is set to the pair (length before the local search, local search time)
+# <time_budgets> is the dict of the wall-clock budgets in seconds of the algorithms and <instance_budget> is the budget
+# of all of them, if any of them is given the heuristics run concurrently in the solver processes (see solver_pool.py)
+# and are killed at their budgets, then the IP starts from the best of their schedules and stops at its budget.
+# The algorithms stopped at their budgets have the None length (and gap) and schedule unless the IP has found one,
+# if <statuses> is a dict, statuses[a] is set to solver_pool.OK_STATUS or solver_pool.TIMEOUT_STATUS,
+# or to solver_pool.CAPPED_STATUS if the exact search is stopped before proving its schedule optimal
+# <IP_verbose> is the Gurobi output flag of the IP, 0 for no solver log
+def run_algos(algos, instance, robots, IP_licence=None, partition_engine="scan", partition_result=None,
+              random_portfolio=None, IP_tighten=False, options=None):
+
+    unknown = set(options or {}) - set(RUN_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown run options {sorted(unknown)}")
+
+    options = {**RUN_OPTIONS, **(options or {})}
+    counters, trace_memory, cache = options["counters"], options["trace_memory"], options["cache"]
+    IP_skip_optimal, local_search = options["IP_skip_optimal"], options["local_search"]
+    gaps, searches, statuses = options["gaps"], options["searches"], options["statuses"]
+    time_budgets, instance_budget, IP_verbose = options["time_budgets"], options["instance_budget"], options["IP_verbose"]
+
+    task_locations, durations = graph_tasks(instance)
+    tasks = list(zip(task_locations.tolist(), durations.astype(int).tolist()))
+    lower_bound = bounds.lower_bound(instance, robots)
+
+    instance_start = time.time()
+    concurrent = time_budgets is not None or instance_budget is not None
+
+    # the time.time() deadline of the algorithm <a> started at <start_time>, None if there is no budget
+    def deadline(a, start_time):
+        limits = [start_time + time_budgets[a]] if time_budgets is not None and time_budgets.get(a) is not None else []
+        if instance_budget is not None:
+            limits.append(instance_start + instance_budget)
+        return min(limits) if limits else None
+
+    # the algorithms stopped at their own search limits
+    capped = set()
+
+    def run_algorithm(a, module, max_length, best_schedule, time_limit=None):
+
+        if a == "e":
+            length, schedule, optimal = module.Exact_Algorithm(instance, robots, initial_schedule=best_schedule,
+                                                               time_limit=module.TIME_LIMIT if time_limit is None else time_limit)
+            if not optimal:
+                capped.add(a)
+            return length, schedule
+        if a == "i":
+            return module.Optimize_Robot_Scheduling(len(instance), 
+                                                    tasks, 
+                                                    robots,
+                                                    license=IP_licence,
+                                                    max_time=max_length + 2,
+                                                    verbose=IP_verbose,
+                                                    initial_schedule=best_schedule,
+                                                    tighten=IP_tighten,
+                                                    lower_bound=lower_bound,
+                                                    time_limit=time_limit)
+        return run_heuristic(a, module, instance, robots, partition_engine, random_portfolio)
+
+    # the parameters that change the results of the algorithms, they are a part of the cache key
+    cache_options = {"p": None, "i": {"tighten": IP_tighten}, "g": None, "r": {"portfolio": random_portfolio}, "e": None}
+
+    # the cached result is used unless the counters are measured
+    def cache_key(a):
+        return cache.key(len(instance), tasks, robots, a, cache_options[a]) if cache is not None and counters is None else None
+
+    # the (length, schedule, time, counters, status) results of the heuristics solved concurrently
+    solved = {}
+    if concurrent:
+
+        pool = SolverPool()
+        for a in HEURISTIC_ALGOS:
+            key = cache_key(a)
+            if a in algos and not (a == "p" and partition_result is not None) and (key is None or key not in cache):
+                pool.submit(a, deadline(a, instance_start), solve_heuristic, a, instance, robots, partition_engine, random_portfolio,
+                            counters is not None, trace_memory)
+
+        for a, status, result in pool.results():
+            solved[a] = (*result, status) if status == OK_STATUS else (None, None, time.time() - instance_start, None, status)
 
     schedules = {}
     s_lengths = {}
     times = {}
 
-    max_length = len(instance)*2 + sum(instance)
+    max_length = len(instance)*2 + int(durations.sum())
+    best_schedule = None
 
-    for a in ["p", "i", "g", "r"]:
+    # the IP goes after all the heuristics when they run concurrently, so it starts from the best of them
+    for a in (["p", "g", "r", "e", "i"] if concurrent else ["p", "e", "i", "g", "r"]):
 
         s_lengths[a] = 0
         schedules[a] = None
         times[a] = 0
+        status = OK_STATUS
+
+        if a not in algos:
+            continue
+
+        # the schedule found before the IP is optimal
+        if a == "i" and IP_skip_optimal and best_schedule is not None and max_length <= lower_bound:
+            s_lengths[a], schedules[a] = max_length, best_schedule
+            if statuses is not None:
+                statuses[a] = status
+            continue
+
+        key = cache_key(a)
+        cached = cache.get(key) if key is not None else None
+
+        if cached is not None:
+            s_lengths[a], schedules[a], times[a] = cached
+        elif a in solved:
+            s_lengths[a], schedules[a], times[a], algorithm_counters, status = solved[a]
+            if counters is not None:
+                counters[a] = algorithm_counters if algorithm_counters is not None else \
+                              {counter: None for counter in (*instrumentation.RUN_COUNTERS, *instrumentation.ALGORITHM_COUNTERS[a])}
+        else:
+            # the module is loaded before the timer starts, so the first run of the algorithm does not pay for the import
+            module = load_algorithm(a)
+
+            start_time = time.time()
+            algorithm_deadline = deadline(a, start_time) if concurrent else None
+            time_limit = None if algorithm_deadline is None else algorithm_deadline - start_time
+
+            try:
+                if a == "p" and partition_result is not None:
+                    s_lengths[a], schedules[a], times[a], partition_counters = partition_result
+                    if counters is not None:
+                        counters[a] = partition_counters
+                elif counters is not None:
+                    (s_lengths[a], schedules[a]), counters[a] = instrumentation.measure(a, run_algorithm, a, module, max_length,
+                                                                                        best_schedule, time_limit, memory=trace_memory)
+                    times[a] = time.time() - start_time
+                else:
+                    s_lengths[a], schedules[a] = run_algorithm(a, module, max_length, best_schedule, time_limit)
+                    times[a] = time.time() - start_time
+            except RuntimeError:
+                # the IP found no schedule within its budget, the exact search always returns at least the PA schedule
+                if algorithm_deadline is None or time.time() < algorithm_deadline:
+                    raise
+                s_lengths[a], schedules[a], times[a] = None, None, time.time() - start_time
+
+            if algorithm_deadline is not None and time.time() >= algorithm_deadline:
+                status = TIMEOUT_STATUS
+            elif a in capped:
+                status = CAPPED_STATUS
+
+        if key is not None and cached is None and status == OK_STATUS:
+            cache.put(key, a, s_lengths[a], schedules[a], times[a])
+
+        if statuses is not None:
+            statuses[a] = status
+
+        # the local search pass improves the schedule of the algorithm, the cache keeps the schedule before it
+        if local_search is not None and a in LOCAL_SEARCH_ALGOS and schedules[a] is not None:
+
+            base_length = s_lengths[a]
+            start_time = time.time()
+            s_lengths[a], schedules[a] = Local_Search(instance, robots, schedules[a], **local_search)
+            if searches is not None:
+                searches[a] = (base_length, time.time() - start_time)
+
+        if schedules[a] is not None:
+            max_length, best_schedule = min((max_length, best_schedule), (s_lengths[a], schedules[a]), key=lambda x: x[0])
+
+    if gaps is not None:
+        gaps["lower_bound"] = lower_bound
+        gaps.update({a: bounds.optimality_gap(s_lengths[a], lower_bound) if s_lengths[a] is not None else None for a in algos})
 
-        start_time = time.time()
-        
-        if a in algos:
-            s_lengths[a], schedules[a] = run_algorithm(a, max_length)
-            max_length = min(max_length, s_lengths[a])
+    return s_lengths, schedules, times
+
+
+# the status columns are written with the time budgets and with the exact search,
+# which may stop before proving its schedule optimal
+def report_statuses(algos, budgets):
+
+    return budgets is not None or "e" in algos
+
+
+# lists the independent work units of the <MODE 2> experiment in the order of the serial run,
+# a unit is the tuple (n_vertices, n_tasks, dur) with all its instances and numbers of robots
+def experiment_units(config):
+
+    units = []
+
+    # path length
+    for n_vertices in range(config.get("path_vertices_min", 3), 
+                             config.get("path_vertices_max", 10) + 1, 
+                             config.get("path_vertices_step", 1)):
+
+        tasks_n_max = config.get("tasks_num_max") or n_vertices
+        tasks_n_max = min(tasks_n_max, n_vertices)
         
-        times[a] = time.time() - start_time
+        # number of tasks
+        for n_tasks in range(config.get("tasks_num_min", 1), 
+                             tasks_n_max + 1, 
+                             config.get("tasks_num_step", 1)):
+            
+            # tasks durations
+            for dur in range(config.get("dur_param_min", 1), 
+                             config.get("dur_param_max", 10) + 1, 
+                             config.get("dur_param_step", 1)):
+
+                units.append((n_vertices, n_tasks, dur))
+
+    return units
+
+
+# the deterministic seed of the work unit, it depends only on the experiment seed and the unit parameters
+def unit_seed(seed, unit):
+
+    return int(np.random.SeedSequence([seed, *unit]).generate_state(1)[0])
+
+
+# the numbers of robots of the <MODE 2> instances on the path with <n_vertices> vertices
+def unit_robots_numbers(config, n_vertices):
+
+    robots_n_max = config.get("robots_num_max") or n_vertices-1
+    robots_n_max = min(robots_n_max, n_vertices-1)
+
+    return list(range(config.get("robots_n_min", 2), robots_n_max + 1, config.get("robots_n_step", 1)))
+
+
+# generates the instances of the work unit and runs the algorithms on them, 
+# the instances are read from the instance store config["dataset"] if it is given
+# returns the results (n_vertices, tasks, robots, s_lengths, times, schedules, extra) and the lines for the collisions file,
+# extra is the dict of the gap columns values, the search columns values if <local_search>, the status columns values
+# if <budgets> and the counter columns values if <instrument>
+# <budgets> is the dict with the run_algos time budgets parameters (time_budgets, instance_budget)
+# the results are cached in the result cache config["cache"] if it is given
+def run_unit(unit, config, algos, licence, partition_engine, random_portfolio, IP_tighten=False, instrument=False, trace_memory=False,
+             IP_skip_optimal=True, local_search=None, budgets=None):
+
+    n_vertices, n_tasks, dur = unit
+
+    random.seed(unit_seed(config.get("seed", 0), unit))
+    np.random.seed(unit_seed(config.get("seed", 0), unit))
+
+    # all the instances and robots positions are generated first 
+    # to solve the Partition_Algorithm for the instances of the same shape in batches
+    generated = []
+
+    if config.get("dataset"):
+
+        import instance_store
+        generated = instance_store.open_store(config["dataset"]).unit_instances(unit)
+
+    #for each instance 
+    for instance_id in range(config.get("max_instances_num", 10) if not config.get("dataset") else 0):
+
+        tasks_durations = generate_tasks_durations(dur, n_tasks, config.get("tasks_dur_distr", "equal"))
+        instance = generate_random_instance(n_vertices, tasks_durations, config.get("tasks_pos_distr", "uniform"))
+
+        # number of robots
+        for n_robots in unit_robots_numbers(config, n_vertices): #for the number of robots
+                
+            robots = generate_positions(n_vertices, n_robots, config.get("robots_distr", "uniform"))
+            generated.append((instance, robots))
+
+    cache = None
+    if config.get("cache"):
+        import result_cache
+        cache = result_cache.open_cache(config["cache"], max_entries=config.get("cache_max_entries", None),
+                                        max_bytes=config.get("cache_max_bytes", None))
+
+    partition_results = [None] * len(generated)
+    if "p" in algos:
+
+        # only the instances without the cached Partition_Algorithm results are solved
+        solve = [i for i, (instance, robots) in enumerate(generated) if cache is None or instrument or
+                 cache.key(len(instance), list(zip(*(a.astype(int).tolist() for a in graph_tasks(instance)))), robots, "p") not in cache]
+
+        batch_results = run_partition_batches([generated[i][0] for i in solve], [generated[i][1] for i in solve],
+                                              instrument=instrument, trace_memory=trace_memory)
+        for i, result in zip(solve, batch_results):
+            partition_results[i] = result
+
+    results = []
+    collisions = []
+
+    for (instance, robots), partition_result in zip(generated, partition_results):
+
+        n_robots = len(robots)
+        task_locations, durations = graph_tasks(instance)
+        tasks = list(zip(task_locations.tolist(), durations.astype(int).tolist()))
+
+        counters = {} if instrument else None
+        gaps = {}
+        searches = {}
+        statuses = {}
+        s_lengths, schedules, times = run_algos(algos, instance, robots, IP_licence=licence, partition_engine=partition_engine,
+                                                partition_result=partition_result, random_portfolio=random_portfolio,
+                                                IP_tighten=IP_tighten,
+                                                options={"counters": counters, "trace_memory": trace_memory, "cache": cache,
+                                                         "IP_skip_optimal": IP_skip_optimal, "gaps": gaps,
+                                                         "local_search": local_search, "searches": searches, "statuses": statuses,
+                                                         **(budgets or {})})
+
+        results.append((n_vertices, tasks, robots, s_lengths, times, schedules, 
+                        {**bounds.gap_values(gaps), **search_values(searches),
+                         **(status_values(statuses) if report_statuses(algos, budgets) else {}),
+                         **(instrumentation.counter_values(counters) if instrument else {})}))
+
+        for a in algos:
+            # the algorithm is stopped at its time budget
+            if schedules[a] is None:
+                continue
+            report = verify_schedule(schedules[a], tasks=tasks, robots=robots)
+            if not report["valid"]:
+                collisions.append(f"Problems are detected in the schedule generated by algorithm {a} "
+                                  f"for instance {tasks} and robots locations {[int(r) for r in robots]}: "
+                                  f"vertex conflicts {report['vertex_conflicts']}, "
+                                  f"swap conflicts {report['swap_conflicts']}, "
+                                  f"adjacency violations {report['adjacency_violations']}, "
+                                  f"incomplete tasks {report['incomplete_tasks']}, "
+                                  f"wrong starts {report['wrong_starts']}.\n")
+
+    return results, collisions
+
+
+# the config keys that do not change the results of the experiment, the checkpoint is resumed if only they change
+CHECKPOINT_IGNORED_KEYS = ("algos", "partition_engine", "processes", "input_file", "output_dir", "cache", "cache_max_entries",
+                           "cache_max_bytes", "WLSACCESSID", "WLSSECRET", "LICENSEID")
+
+
+# the hash of the <MODE 2> experiment: the config and the run <options> that change the results and the output columns
+def experiment_hash(config, **options):
+
+    settings = {key: value for key, value in config.items() if key not in CHECKPOINT_IGNORED_KEYS}
+    canonical = json.dumps({"config": settings, **options}, sort_keys=True, default=str)
+
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# the finished units recorded in the checkpoint file of the experiment with the hash <config_hash>,
+# the hash is the first line of the file, a new checkpoint file is started with it
+# raises ValueError if the checkpoint is of a different experiment, so the results of different configs are not mixed
+def read_checkpoint(checkpoint_path, config_hash):
+
+    header = f"config {config_hash}"
+
+    if not os.path.exists(checkpoint_path) or os.path.getsize(checkpoint_path) == 0:
+        with open(checkpoint_path, "w") as checkpoint:
+            checkpoint.write(header + "\n")
+        return set()
+
+    with open(checkpoint_path, "r") as checkpoint:
+        lines = checkpoint.read().splitlines()
+
+    if lines[0] != header:
+        raise ValueError(f"The checkpoint {checkpoint_path} is of a different experiment config, "
+                         f"use another output folder or remove the checkpoint and the results to start again")
+
+    return {tuple(map(int, line.split(","))) for line in lines[1:] if line.strip()}
+
+
+# runs the <MODE 2> experiment on a pool of <processes> processes (in the current process if 1)
+# the results are written in the order of the serial run, the finished units are recorded in the checkpoint file
+# <output_dir>/checkpoint.txt, and they are skipped if the experiment is restarted with the same config (see read_checkpoint)
+# with <instrument> the counters of the algorithms are written as additional columns
+def run_experiment(config, algos, output_dir, licence, partition_engine, random_portfolio, processes=1, output_format=CSV_FORMAT,
+                   IP_tighten=False, instrument=False, trace_memory=False, IP_skip_optimal=True, local_search=None, budgets=None):
+
+    checkpoint_path = f"{output_dir}/checkpoint.txt"
+    finished = read_checkpoint(checkpoint_path,
+                               experiment_hash(config, algos=algos, random_portfolio=random_portfolio, output_format=output_format,
+                                               IP_tighten=IP_tighten, instrument=instrument, trace_memory=trace_memory,
+                                               IP_skip_optimal=IP_skip_optimal, local_search=local_search, budgets=budgets))
+
+    if config.get("dataset"):
+        import instance_store
+        units = instance_store.open_store(config["dataset"]).units()
+    else:
+        units = experiment_units(config)
+
+    units = [unit for unit in units if unit not in finished]
+    worker = partial(run_unit, config=config, algos=algos, licence=licence, 
+                     partition_engine=partition_engine, random_portfolio=random_portfolio, IP_tighten=IP_tighten,
+                     instrument=instrument, trace_memory=trace_memory, IP_skip_optimal=IP_skip_optimal, local_search=local_search,
+                     budgets=budgets)
+
+    executor = None
+    if processes == 1:
+        results = map(worker, units)
+    else:
+        executor = ProcessPoolExecutor(max_workers=processes)
+        results = executor.map(worker, units)
+
+    writers = {}
+    extra_columns = ("dur", *bounds.gap_columns(algos), *(search_columns(algos) if local_search is not None else ()),
+                     *(status_columns(algos) if report_statuses(algos, budgets) else ()),
+                     *(instrumentation.counter_columns(algos) if instrument else ()))
+
+    with open(checkpoint_path, "a") as checkpoint, open(f"{output_dir}/collisions.txt", "a") as collisions_file:
+
+        for unit, (unit_results, collisions) in zip(units, results):
+
+            n_vertices, _, dur = unit
+            if n_vertices not in writers:
+                writers[n_vertices] = ResultWriter(f"{output_dir}/{n_vertices}.{output_format}", algos, 
+                                                   output_format=output_format, extra_columns=extra_columns)
+
+            for *result, extra in unit_results:
+                writers[n_vertices].add(*result, dur=dur, **extra)
+
+            # the unit is recorded as finished only after its results are written
+            writers[n_vertices].flush()
+            collisions_file.writelines(collisions)
+            collisions_file.flush()
+
+            checkpoint.write(",".join(map(str, unit)) + "\n")
+            checkpoint.flush()
+
+    for writer in writers.values():
+        writer.close()
+
+    if executor is not None:
+        executor.shutdown()
 
-    return s_lengths, schedules, times
 
 if __name__ == "__main__":
 
@@ -96,14 +557,35 @@ if __name__ == "__main__":
     parser.add_argument("--output_dir", type=str, default=None,
                         help="Output dir for results")
     parser.add_argument("--algos", type=str, default=None,
-                        help="The algorithms to run: p - Partition, i - IP, g - Greedy, r - Random")
+                        help="The algorithms to run: p - Partition, i - IP, g - Greedy, r - Random, e - Exact search")
+    parser.add_argument("--partition_engine", type=str, default=None,
+                        help="The Partition engine: scan - reference, bisect - fast for large instances")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of processes for the experiment with generated instances")
+    parser.add_argument("--serve", action="store_true",
+                        help="Serve the JSONL scheduling requests from stdin (or from --socket) until the input ends")
+    parser.add_argument("--socket", type=str, default=None,
+                        help="The unix socket path to serve the requests on with --serve")
+    parser.add_argument("--dataset", type=str, default=None,
+                        help="The instance store (see instance_store.py) to read the instances of the experiment from")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="The SQLite result cache, the cached results are not solved again")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Collect the counters of the algorithms and write them as additional output columns")
     
     args = parser.parse_args()
 
     with open(args.config, 'r') as f:
         config = json.load(f)
 
+    if args.dataset is not None:
+        config["dataset"] = args.dataset
+    if args.cache is not None:
+        config["cache"] = args.cache
+
     algos = args.algos if args.algos is not None else config.get("algos", "pigr")
+    partition_engine = args.partition_engine if args.partition_engine is not None \
+                       else config.get("partition_engine", "scan")
     
     licence = None
     if "i" in algos:
@@ -111,98 +593,89 @@ if __name__ == "__main__":
                     "WLSSECRET": config.get("WLSSECRET", None),
                     "LICENSEID": config.get("LICENSEID", None)}
 
+    random_portfolio = None
+    if config.get("random_restarts", 1) > 1:
+        random_portfolio = {"restarts": config["random_restarts"],
+                            "seed": config.get("random_seed", 0),
+                            "processes": config.get("random_processes", None),
+                            "time_budget": config.get("random_time_budget", None)}
+
+    IP_tighten = config.get("ip_tighten", False)
+    IP_skip_optimal = config.get("ip_skip_optimal", True)
+
+    local_search = None
+    if config.get("local_search", False):
+        local_search = {"max_iterations": config.get("local_search_iterations", 1000),
+                        "time_budget": config.get("local_search_time_budget", None)}
+
+    budgets = None
+    if config.get("time_budgets") is not None or config.get("instance_time_budget") is not None:
+        budgets = {"time_budgets": config.get("time_budgets", None),
+                   "instance_budget": config.get("instance_time_budget", None)}
+
+    instrument = args.instrument or config.get("instrument", False)
+    trace_memory = config.get("trace_memory", False)
+
+    output_format = config.get("output_format", CSV_FORMAT)
+    processes = args.processes if args.processes is not None else config.get("processes", 1)
+
     input_file = args.input_file if args.input_file is not None else config.get("input_file", None)
     output_dir = args.output_dir if args.output_dir is not None else config.get("output_dir", "output")
     
     os.makedirs(output_dir, exist_ok=True)
 
-    if input_file:
+    cache = None
+    if config.get("cache"):
+        import result_cache
+        cache = result_cache.open_cache(config["cache"], max_entries=config.get("cache_max_entries", None),
+                                        max_bytes=config.get("cache_max_bytes", None))
+
+    if args.serve:
+
+        import serve
+        serve.serve({"algos": algos, "IP_licence": licence, "partition_engine": partition_engine,
+                     "random_portfolio": random_portfolio, "IP_tighten": IP_tighten,
+                     "options": {"cache": cache, "IP_skip_optimal": IP_skip_optimal, "local_search": local_search,
+                                 **(budgets or {})}}, socket_path=args.socket)
+
+    elif input_file:
+
+        import pandas as pd
+        import ast
 
         input_df = pd.read_csv(input_file, names=['n_vertices', 'tasks', 'robots'])
         input_file_name = Path(input_file).stem
+        writer = ResultWriter(f"{output_dir}/{input_file_name}.{output_format}", algos, output_format=output_format,
+                              extra_columns=(*bounds.gap_columns(algos), *(search_columns(algos) if local_search is not None else ()),
+                                             *(status_columns(algos) if report_statuses(algos, budgets) else ()),
+                                             *(instrumentation.counter_columns(algos) if instrument else ())))
 
         for idx, row in input_df.iterrows():
 
             tasks = ast.literal_eval(row["tasks"])
-            instance = np.zeros(row["n_vertices"])
-            for t in tasks:
-                instance[t[0]] = t[1]
+            instance = SparseGraph.from_tasks(row["n_vertices"], tasks)
             robots = ast.literal_eval(row["robots"])
-            s_lengths, schedules, times = run_algos(algos, instance, robots, IP_licence=licence)
-
-            f = open(f"{output_dir}/{input_file_name}.csv","a")
-
-            output_str = f"{len(instance)},{len(robots)},\"{row['tasks']}\",\"{robots}\","
-            for a in algos:
-                lengths_str = f"{s_lengths[a]},"
-                times_str = f"{times[a]},"
-                schedules_str = f"\"{schedules[a]}\","
-            
-            output_str += lengths_str + times_str + schedules_str + "\n"
-
-            f.write(output_str)
+            counters = {} if instrument else None
+            gaps = {}
+            searches = {}
+            statuses = {}
+            s_lengths, schedules, times = run_algos(algos, instance, robots, IP_licence=licence, partition_engine=partition_engine,
+                                                    random_portfolio=random_portfolio, IP_tighten=IP_tighten,
+                                                    options={"counters": counters, "trace_memory": trace_memory, "cache": cache,
+                                                             "IP_skip_optimal": IP_skip_optimal, "gaps": gaps,
+                                                             "local_search": local_search, "searches": searches,
+                                                             "statuses": statuses, **(budgets or {})})
+
+            writer.add(len(instance), tasks, robots, s_lengths, times, schedules, **bounds.gap_values(gaps), **search_values(searches),
+                       **(status_values(statuses) if report_statuses(algos, budgets) else {}),
+                       **(instrumentation.counter_values(counters) if instrument else {}))
+
+        writer.close()
 
     else:
 
-        # path length
-        for n_vertices in range(config.get("path_vertices_min", 3), 
-                                 config.get("path_vertices_max", 10) + 1, 
-                                 config.get("path_vertices_step", 1)):
-
-            f = open(f"{output_dir}/{n_vertices}.csv","a") 
-
-            robots_n_max = n_vertices-1 if config.get("robots_num_max", n_vertices-1) is None else config.get["robots_num_max"]
-            robots_n_max = min(robots_n_max, n_vertices-1)
+        run_experiment(config, algos, output_dir, licence, partition_engine, random_portfolio, processes, output_format, IP_tighten,
+                       instrument, trace_memory, IP_skip_optimal, local_search, budgets)
 
-            tasks_n_max = n_vertices if config.get("tasks_num_max", n_vertices) is None else config.get["tasks_num_max"]
-            tasks_n_max = min(tasks_n_max, n_vertices)
-            
-            # number of tasks
-            for n_tasks in range(config.get("tasks_num_min", 1), 
-                                 tasks_n_max + 1, 
-                                 config.get("tasks_num_step", 1)):
-                
-                # tasks durations
-                for dur in range(config.get("dur_param_min", 1), 
-                                 config.get("dur_param_max", 10) + 1, 
-                                 config.get("dur_param_step", 1)):
-                    
-                    #for each instance 
-                    for instance_id in range(config.get("max_instances_num", 10)):
-
-                        tasks_durations = generate_tasks_durations(dur, n_tasks, config.get("tasks_dur_distr", "equal"))
-                        instance = generate_random_instance(n_vertices, tasks_durations, config.get("tasks_pos_distr", "uniform"))
-
-                        # number of robots
-                        for n_robots in range(config.get("robots_n_min", 2),
-                                              robots_n_max + 1, 
-                                              config.get("robots_n_step", 1)): #for the number of robots
-                                
-                            robots = generate_positions(n_vertices, n_robots, config.get("robots_distr", "uniform"))
-                            task_locations = list(np.nonzero(instance)[0])
-                            tasks = [(task, int(instance[task])) for task in task_locations]
-
-                            s_lengths, schedules, times = run_algos(algos, instance, robots, IP_licence=licence)
-
-                            output_str = f"{n_vertices},{n_robots},\"{tasks}\",\"{robots}\","
-                            
-                            for a in "pigr":
-                                lengths_str = f"{s_lengths[a]},"
-                                times_str = f"{times[a]},"
-                                schedules_str = f"\"{schedules[a]}\","
-                            
-                            output_str += lengths_str + times_str + f"{dur}," + schedules_str + "\n"
-
-                            f.write(output_str)
-
-                            with open(f"{output_dir}/collisions.txt", "a") as collisions_file:
-
-                                for a in algos:
-                                    if not collision_free_check(schedules[a]):
-                                        collisions_file.write(f"Collisions are detected in the schedule generated by algorithm {a} \
-                                                            for instance {instance} and robots locations {robots}.\n")
-                                        collisions_file.write("Schedule with collisions: {}\n".format(schedules[a]))
-
-            f.close()
-
-                    
+    if cache is not None:
+        result_cache.close_caches()
@@ -0,0 +1,99 @@
+import numpy as np
+
+
+# the vertices of one robot that starts at <start> and visits the tasks <stops> (pairs (position, duration)) in this order,
+# moving straight from one task to the next one, as an int32 array
+# the path is built from its run-length segments: each leg is |distance| moves of one edge followed by <duration> waits
+def robot_path(start, stops):
+
+    if len(stops) == 0:
+        return np.array([start], dtype=np.int32)
+
+    stops = np.asarray(stops, dtype=np.int64).reshape(-1, 2)
+    legs = np.diff(stops[:, 0], prepend=start)
+
+    steps = np.repeat(np.column_stack([np.sign(legs), np.zeros_like(legs)]).ravel(),
+                      np.column_stack([np.abs(legs), stops[:, 1]]).ravel())
+
+    path = np.empty(len(steps) + 1, dtype=np.int32)
+    path[0] = start
+    np.cumsum(steps, out=path[1:], dtype=np.int32)
+    path[1:] += start
+
+    return path
+
+
+# the schedule of all the robots as one (k, T) int32 matrix, 4 bytes per robot-timestep
+# positions[r, t] is the vertex of the robot r at the timestep t, lengths[r] is the number of timesteps of its own schedule,
+# the robot stays at its last vertex after it, so the shorter schedules are padded with their last vertices.
+# The schedule behaves as the sequence of the robots schedules: schedule[r] is the view of positions[r, :lengths[r]]
+class Schedule:
+
+    __slots__ = ("positions", "lengths")
+
+    def __init__(self, positions, lengths=None):
+
+        self.positions = np.asarray(positions, dtype=np.int32)
+        self.lengths = np.full(self.positions.shape[0], self.positions.shape[1], dtype=np.int32) if lengths is None \
+                       else np.asarray(lengths, dtype=np.int32)
+
+    # the schedule of the robots schedules <robot_schedules>, an iterable of the sequences of vertices
+    @classmethod
+    def from_robot_schedules(cls, robot_schedules):
+
+        robot_schedules = [np.asarray(s, dtype=np.int32) for s in robot_schedules]
+        lengths = np.array([len(s) for s in robot_schedules], dtype=np.int32)
+
+        positions = np.empty((len(robot_schedules), int(lengths.max()) if len(lengths) else 0), dtype=np.int32)
+        for r, s in enumerate(robot_schedules):
+            positions[r, :len(s)] = s
+            positions[r, len(s):] = s[-1]
+
+        return cls(positions, lengths)
+
+    # the schedule length, i.e. the number of the timesteps after the start
+    def makespan(self):
+
+        return self.positions.shape[1] - 1
+
+    # the view of the vertices of all the robots at the timestep <t>
+    def at(self, t):
+
+        return self.positions[:, min(t, self.positions.shape[1] - 1)]
+
+    # the lazy views of the vertices of all the robots at the consecutive timesteps
+    def timesteps(self):
+
+        for t in range(self.positions.shape[1]):
+            yield self.positions[:, t]
+
+    # the list of the robots schedules as the lists of Python ints
+    def tolist(self):
+
+        return [s.tolist() for s in self]
+
+    def __len__(self):
+
+        return self.positions.shape[0]
+
+    def __getitem__(self, r):
+
+        return self.positions[r, :self.lengths[r]]
+
+    def __iter__(self):
+
+        for r in range(self.positions.shape[0]):
+            yield self.positions[r, :self.lengths[r]]
+
+    def __eq__(self, other):
+
+        if not isinstance(other, Schedule):
+            return NotImplemented
+
+        return np.array_equal(self.lengths, other.lengths) and np.array_equal(self.positions, other.positions)
+
+    __hash__ = None
+
+    def __repr__(self):
+
+        return f"Schedule({self.tolist()})"
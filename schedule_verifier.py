@@ -0,0 +1,136 @@
+import numpy as np
+from schedule import Schedule
+from sparse_graph import SparseGraph
+
+
+# converts the schedule (a Schedule, a list of per-robot lists of vertices or a (k, T) array) into a (k, T) int array,
+# the shorter schedules are padded with their last vertex as the robot stays there after finishing,
+# the matrix of a Schedule is used as it is without a copy
+def schedule_array(schedule):
+
+    if isinstance(schedule, Schedule):
+        return schedule.positions
+
+    if isinstance(schedule, np.ndarray):
+        return schedule
+
+    T = max(len(s) for s in schedule)
+    array = np.empty(shape=(len(schedule), T), dtype=np.int64)
+
+    for r, s in enumerate(schedule):
+        array[r, :len(s)] = s
+        array[r, len(s):] = s[-1]
+
+    return array
+
+
+# finds the timesteps where two robots are at the same vertex
+# returns the list of (timestep, vertex, robot, other robot)
+def vertex_conflicts(positions):
+
+    order = np.argsort(positions, axis=0, kind="stable")
+    sorted_positions = np.take_along_axis(positions, order, axis=0)
+    i, t = np.nonzero(sorted_positions[1:] == sorted_positions[:-1])
+
+    return list(zip(t.tolist(), sorted_positions[i, t].tolist(), order[i, t].tolist(), order[i+1, t].tolist()))
+
+
+# finds the timesteps where two robots swap their vertices, i.e. traverse the same edge in opposite directions
+# returns the list of (timestep, u, v, robot, other robot), where robot moves from u to v and the other robot
+# from v to u between the timesteps t and t+1, u < v
+def swap_conflicts(positions):
+
+    k, T = positions.shape
+    if T < 2:
+        return []
+
+    r, t = np.nonzero(positions[:, 1:] != positions[:, :-1])
+    u = positions[r, t]
+    v = positions[r, t+1]
+    if len(r) == 0:
+        return []
+
+    # the moves sorted by the timestep and the edge {lo, hi}, the moves u -> v with u < v before the opposite ones,
+    # the partner of a move u -> v is the first move v -> u over the same edge at the same timestep.
+    # The moves are not encoded into one integer as the codes overflow on the long paths
+    lo, hi, backward = np.minimum(u, v), np.maximum(u, v), u > v
+    order = np.lexsort((backward, hi, lo, t))
+    sorted_t, sorted_lo, sorted_hi, sorted_backward = t[order], lo[order], hi[order], backward[order]
+
+    group_start = np.ones(len(order), dtype=bool)
+    group_start[1:] = (sorted_t[1:] != sorted_t[:-1]) | (sorted_lo[1:] != sorted_lo[:-1]) | (sorted_hi[1:] != sorted_hi[:-1])
+    group = np.cumsum(group_start) - 1
+
+    first_backward = np.full(group[-1] + 1, -1)
+    first_of_group = sorted_backward & (group_start | ~np.roll(sorted_backward, 1))
+    first_backward[group[first_of_group]] = order[first_of_group]
+
+    partner = np.empty(len(order), dtype=np.int64)
+    partner[order] = first_backward[group]
+    swapped = (partner >= 0) & (u < v)
+
+    return list(zip(t[swapped].tolist(), u[swapped].tolist(), v[swapped].tolist(),
+                    r[swapped].tolist(), r[partner[swapped]].tolist()))
+
+
+# finds the steps where a robot moves further than to the neighbouring vertex
+# returns the list of (robot, timestep) where the robot jumps between the timesteps t and t+1
+def adjacency_violations(positions):
+
+    r, t = np.nonzero(np.abs(np.diff(positions, axis=1)) > 1)
+
+    return list(zip(r.tolist(), t.tolist()))
+
+
+# finds the tasks that are not completed by the schedule
+# a task (position, duration) is completed if a robot arrives at the position and stays there for <duration> more timesteps,
+# the initial position of a robot counts as an arrival
+# returns the list of the uncompleted tasks
+def incomplete_tasks(positions, tasks):
+
+    k, T = positions.shape
+
+    # split the schedules of all robots into runs of the same vertex
+    starts = np.ones(shape=(k, T), dtype=bool)
+    starts[:, 1:] = positions[:, 1:] != positions[:, :-1]
+    run_ids = np.cumsum(starts.ravel()) - 1
+    run_lengths = np.bincount(run_ids)
+    run_vertices = positions.ravel()[starts.ravel()]
+
+    # the longest stay at each visited vertex, found only for the visited vertices and not for the whole path
+    order = np.argsort(run_vertices, kind="stable")
+    run_vertices, run_lengths = run_vertices[order], run_lengths[order]
+    firsts = np.flatnonzero(np.concatenate([[True], run_vertices[1:] != run_vertices[:-1]]))
+    visited = run_vertices[firsts]
+    longest_stay = np.maximum.reduceat(run_lengths, firsts)
+
+    task_locations = np.array([int(p) for p, _ in tasks], dtype=np.int64)
+    idx = np.minimum(np.searchsorted(visited, task_locations), len(visited) - 1)
+    stays = np.where(visited[idx] == task_locations, longest_stay[idx], 0)
+
+    return [(int(p), int(d)) for (p, d), stay in zip(tasks, stays.tolist()) if stay < int(d) + 1]
+
+
+# verifies the schedule and returns the report with the locations of all the found problems
+# <tasks> is the list of pairs (position, duration) or the SparseGraph, if given the completion of the tasks is checked
+# <robots> is the list of robots starting positions, if given the starting positions are checked
+def verify_schedule(schedule, tasks=None, robots=None):
+
+    positions = schedule_array(schedule)
+    if isinstance(tasks, SparseGraph):
+        tasks = tasks.tasks()
+
+    report = {"vertex_conflicts": vertex_conflicts(positions),
+              "swap_conflicts": swap_conflicts(positions),
+              "adjacency_violations": adjacency_violations(positions),
+              "incomplete_tasks": incomplete_tasks(positions, tasks) if tasks else [],
+              "wrong_starts": []}
+
+    if robots is not None:
+        report["wrong_starts"] = np.nonzero(positions[:, 0] != np.asarray(robots))[0].tolist()
+
+    report["collision_free"] = not report["vertex_conflicts"] and not report["swap_conflicts"]
+    report["valid"] = report["collision_free"] and not report["adjacency_violations"] and \
+                      not report["incomplete_tasks"] and not report["wrong_starts"]
+
+    return report
@@ -0,0 +1,100 @@
+import json
+import os
+import socketserver
+import sys
+from run import run_algos
+from sparse_graph import SparseGraph
+
+
+# solves one scheduling request and returns the response dict
+# the request is a dict {"id": ..., "n": <vertices number>, "tasks": [[position, duration], ...], "robots": [...], "algos": "pg"},
+# "id" and "algos" are optional, the algorithms from <options> are used if "algos" is not given
+# <options> are the keyword arguments of run_algos and the default "algos",
+# options["options"] are the run options of all the requests, the IP runs without the solver log
+def handle_request(request, options):
+
+    algos = request.get("algos", options.get("algos", "p"))
+    run_options = {key: value for key, value in options.items() if key not in ("algos", "options")}
+
+    instance = SparseGraph.from_tasks(int(request["n"]), request["tasks"])
+    robots = [int(r) for r in request["robots"]]
+
+    gaps = {}
+    searches = {}
+    statuses = {}
+    s_lengths, schedules, times = run_algos(algos, instance, robots,
+                                            options={**options.get("options", {}), "gaps": gaps, "searches": searches,
+                                                     "statuses": statuses, "IP_verbose": 0},
+                                            **run_options)
+
+    return {"id": request.get("id"),
+            "lengths": {a: s_lengths[a] for a in algos},
+            "lower_bound": gaps["lower_bound"],
+            "gaps": {a: gaps[a] for a in algos},
+            "base_lengths": {a: base_length for a, (base_length, _) in searches.items()},
+            "statuses": {a: statuses[a] for a in algos},
+            "times": {a: times[a] for a in algos},
+            "schedules": {a: schedules[a].tolist() if schedules[a] is not None else None for a in algos}}
+
+
+# reads the JSONL requests from <input_stream> one at a time and writes a JSONL response for each of them
+# as soon as it is solved, a request that cannot be solved gets the {"id": ..., "error": ...} response
+def serve_stream(input_stream, output_stream, options):
+
+    for line in input_stream:
+
+        if not line.strip():
+            continue
+
+        request = {}
+        try:
+            request = json.loads(line)
+            response = handle_request(request, options)
+        except Exception as e:
+            response = {"id": request.get("id") if isinstance(request, dict) else None, "error": f"{type(e).__name__}: {e}"}
+
+        output_stream.write(json.dumps(response, default=int) + "\n")
+        output_stream.flush()
+
+
+# serves the JSONL requests on the local unix socket <socket_path>, each connection is a stream of requests
+def serve_socket(socket_path, options):
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            serve_stream((line.decode() for line in self.rfile), SocketWriter(self.wfile), options)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    with socketserver.UnixStreamServer(socket_path, RequestHandler) as server:
+        server.serve_forever()
+
+
+# the text stream wrapper of the socket for serve_stream
+class SocketWriter:
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        self.wfile.write(text.encode())
+
+    def flush(self):
+        self.wfile.flush()
+
+
+# serves the requests from stdin, or from the unix socket if <socket_path> is given
+# on stdin the responses are the only output on stdout: the file descriptor 1 is redirected to stderr,
+# so everything else printed (also by the solvers libraries) goes there, and the responses are written to its copy
+def serve(options, socket_path=None):
+
+    if socket_path is None:
+        sys.stdout.flush()
+        output_stream = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        serve_stream(sys.stdin, output_stream, options)
+        output_stream.close()
+    else:
+        serve_socket(socket_path, options)
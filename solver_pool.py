@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+
+# the statuses of the algorithms results: finished, stopped at the time budget,
+# or stopped at its own search limit before proving its schedule optimal (the exact search)
+OK_STATUS = "ok"
+TIMEOUT_STATUS = "timeout"
+CAPPED_STATUS = "capped"
+
+
+# the entry point of a solver process, sends (True, result) or (False, exception) to <connection>
+# the solver leads its own process group, so the processes it starts (e.g. the Random_Portfolio pool) are killed with it
+def solver_main(connection, function, args, kwargs):
+
+    os.setpgid(0, 0)
+
+    try:
+        result = (True, function(*args, **kwargs))
+    except Exception as e:
+        result = (False, e)
+
+    connection.send(result)
+    connection.close()
+
+
+# the solvers of one instance running concurrently, each one in its own process,
+# so a solver that goes over its deadline is killed and does not stall the others.
+# A solver is killed as soon as its result is received as well, the processes it leaves behind do not outlive it
+class SolverPool:
+
+    def __init__(self):
+
+        self.context = multiprocessing.get_context()
+        # the running solvers by the name: (process, connection, deadline)
+        self.running = {}
+
+    # starts function(*args, **kwargs) as the solver <name>, it is killed at the time.time() <deadline> (no limit if None)
+    def submit(self, name, deadline, function, *args, **kwargs):
+
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=solver_main, args=(sender, function, args, kwargs))
+        process.start()
+        sender.close()
+
+        self.running[name] = (process, receiver, deadline)
+
+    # yields (name, status, result) of the solvers as soon as each of them finishes,
+    # the solvers that are not finished by their deadlines are killed and yielded with TIMEOUT_STATUS and None,
+    # the exception of a failed solver is raised after the other solvers are killed
+    def results(self):
+
+        try:
+            while self.running:
+
+                deadlines = [deadline for _, _, deadline in self.running.values() if deadline is not None]
+                timeout = max(0, min(deadlines) - time.time()) if deadlines else None
+                ready = wait([connection for _, connection, _ in self.running.values()], timeout=timeout)
+
+                for name in [name for name, (_, connection, _) in self.running.items() if connection in ready]:
+
+                    try:
+                        success, result = self.running[name][1].recv()
+                    except EOFError:
+                        success, result = False, RuntimeError(f"The solver {name} exited unexpectedly")
+                    self.kill(name)
+
+                    if not success:
+                        raise result
+
+                    yield name, OK_STATUS, result
+
+                now = time.time()
+                for name in [name for name, (_, _, deadline) in self.running.items() if deadline is not None and deadline <= now]:
+                    self.kill(name)
+                    yield name, TIMEOUT_STATUS, None
+
+        finally:
+            self.close()
+
+    # kills the solver <name> with its process group
+    def kill(self, name):
+
+        process, connection, _ = self.running.pop(name)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # the solver has not created its process group yet
+            process.kill()
+        process.join()
+        connection.close()
+
+    # kills all the running solvers
+    def close(self):
+
+        for name in list(self.running):
+            self.kill(name)
+
+
+# the names of the result columns with the statuses of the algorithms <algos>
+def status_columns(algos):
+
+    return [f"{a}_status" for a in algos]
+
+
+# flattens the statuses dict filled in by run_algos into the status columns values
+def status_values(statuses):
+
+    return {f"{a}_status": status for a, status in statuses.items()}
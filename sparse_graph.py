@@ -0,0 +1,99 @@
+import numpy as np
+
+
+# the path graph of <n> vertices given by its tasks only: the sorted task positions and their durations,
+# so the memory and the work of the algorithms depend on the number of tasks m and n is only the bound of the positions.
+# It is accepted everywhere the dense graph (the array of the tasks durations, 0 for the vertices without tasks) is:
+# len(graph) is n and graph[v] is the duration of the task at v (0 if there is none) found by a binary search,
+# the algorithms never iterate over the vertices of a SparseGraph
+class SparseGraph:
+
+    __slots__ = ("n", "task_locations", "durations")
+
+    def __init__(self, n, task_locations, durations):
+
+        task_locations = np.asarray(task_locations, dtype=np.int64).reshape(-1)
+        durations = np.asarray(durations, dtype=np.int64).reshape(-1)
+
+        # a task of duration 0 is no task, as in the dense graph
+        order = np.argsort(task_locations, kind="stable")
+        keep = durations[order] != 0
+
+        self.n = int(n)
+        self.task_locations = task_locations[order][keep]
+        self.durations = durations[order][keep]
+
+        if len(self.task_locations) > 0 and (self.task_locations[0] < 0 or self.task_locations[-1] >= self.n):
+            raise ValueError(f"The task positions must be in [0, {self.n}), got {self.task_locations.tolist()}")
+
+        if np.any(np.diff(self.task_locations) == 0):
+            raise ValueError(f"There is more than one task at the same position in {self.task_locations.tolist()}")
+
+    # the graph of <n> vertices with the tasks <tasks> (pairs (position, duration))
+    @classmethod
+    def from_tasks(cls, n, tasks):
+
+        tasks = np.asarray(tasks, dtype=np.int64).reshape(-1, 2)
+
+        return cls(n, tasks[:, 0], tasks[:, 1])
+
+    # the sparse graph of the dense graph <graph>
+    @classmethod
+    def from_dense(cls, graph):
+
+        task_locations, durations = graph_tasks(graph)
+
+        return cls(len(graph), task_locations, durations)
+
+    # the list of the tasks (position, duration) as Python ints
+    def tasks(self):
+
+        return list(zip(self.task_locations.tolist(), self.durations.tolist()))
+
+    # the dense graph of the same tasks, takes O(n) memory
+    def dense(self):
+
+        graph = np.zeros(self.n)
+        graph[self.task_locations] = self.durations
+
+        return graph
+
+    def __len__(self):
+
+        return self.n
+
+    def __getitem__(self, vertex):
+
+        if not 0 <= vertex < self.n:
+            raise IndexError(f"The vertex {vertex} is not in [0, {self.n})")
+
+        idx = np.searchsorted(self.task_locations, vertex)
+        found = idx < len(self.task_locations) and self.task_locations[idx] == vertex
+
+        return self.durations[idx] if found else 0
+
+    def __eq__(self, other):
+
+        if not isinstance(other, SparseGraph):
+            return NotImplemented
+
+        return self.n == other.n and np.array_equal(self.task_locations, other.task_locations) and \
+               np.array_equal(self.durations, other.durations)
+
+    __hash__ = None
+
+    def __repr__(self):
+
+        return f"SparseGraph({self.n}, {self.tasks()})"
+
+
+# the sorted task positions and the tasks durations of the dense or the sparse <graph> as two arrays
+def graph_tasks(graph):
+
+    if isinstance(graph, SparseGraph):
+        return graph.task_locations, graph.durations
+
+    graph = np.asarray(graph)
+    task_locations = np.nonzero(graph)[0]
+
+    return task_locations, graph[task_locations]
@@ -0,0 +1,28 @@
+import pytest
+from result_writer import ResultWriter, read_results, read_schedule, schedules_path, PARQUET_FORMAT
+from schedule import Schedule
+
+pytest.importorskip("pyarrow")
+
+
+# a batch with only None lengths and gaps followed by a batch with the values is written with the same schema
+def test_parquet_none_batch_then_values(tmp_path):
+
+    path = str(tmp_path / "results.parquet")
+    tasks = [(1, 2), (4, 1)]
+    robots = [0, 5]
+    schedule = Schedule.from_robot_schedules([[0, 1, 1, 1], [5, 4, 4]])
+
+    with ResultWriter(path, "g", output_format=PARQUET_FORMAT, extra_columns=("lower_bound", "g_gap", "g_status"),
+                      buffer_rows=1) as writer:
+        writer.add(10, tasks, robots, {"g": None}, {"g": 0.5}, {"g": None}, lower_bound=3, g_gap=None, g_status="timeout")
+        writer.add(10, tasks, robots, {"g": 4}, {"g": 0.1}, {"g": schedule}, lower_bound=3, g_gap=0.25, g_status="ok")
+
+    results = read_results(path)
+
+    assert results["g_length"].isna().tolist() == [True, False]
+    assert results["g_length"].iloc[1] == 4
+    assert results["g_gap"].iloc[1] == 0.25
+    assert results["g_status"].tolist() == ["timeout", "ok"]
+    assert results["g_schedule_offset"].tolist()[0] == -1
+    assert read_schedule(schedules_path(path), results["g_schedule_offset"].iloc[1]) == schedule
@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+pytest.importorskip("gurobipy")
+
+REQUESTS = [{"id": 1, "n": 8, "tasks": [[1, 2], [4, 1], [6, 3]], "robots": [0, 5], "algos": "pi"},
+            {"id": 2, "n": 8, "tasks": [[2, 2], [5, 1]], "robots": [0, 7], "algos": "pi"}]
+
+
+# with the IP requested every stdout line of the stdin serve mode is a JSON response, the diagnostics go to stderr
+def test_serve_stdout_is_jsonl_with_ip(tmp_path):
+
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"algos": "p", "ip_skip_optimal": False}))
+
+    process = subprocess.run([sys.executable, "run.py", "--config", str(config), "--output_dir", str(tmp_path / "output"),
+                              "--serve"], input="".join(json.dumps(r) + "\n" for r in REQUESTS),
+                             capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), timeout=300)
+
+    assert process.returncode == 0, process.stderr
+
+    responses = [json.loads(line) for line in process.stdout.splitlines()]
+
+    assert [response["id"] for response in responses] == [1, 2]
+    for response in responses:
+        assert "error" not in response, response
+        assert response["lengths"]["i"] <= response["lengths"]["p"]